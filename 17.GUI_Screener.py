@@ -0,0 +1,1805 @@
+import os
+import re
+import ast
+import math
+import hashlib
+import warnings
+import queue
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import datetime as dt
+import yfinance as yf
+import tkinter as tk
+from tkinter import filedialog, ttk, PanedWindow, messagebox
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.transforms import Affine2D, Bbox, TransformedBbox
+from matplotlib.colors import to_rgba
+from matplotlib.path import Path
+from matplotlib.ticker import MaxNLocator
+import matplotlib.dates as mdates
+from matplotlib.widgets import SpanSelector
+from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg)
+from matplotlib.backends.backend_agg import RendererAgg
+import Worker_Tasks
+
+
+#%%
+# Streaming Export
+
+# DataFrame.to_excel builds the whole workbook in memory before it writes anything,
+# which is very slow and needs a lot of memory for large frames. write_frame writes
+# the rows chunk by chunk instead, so memory use stays the same for any size:
+### Excel: openpyxl's write-only workbook streams every appended row to a temporary
+    # file. A sheet holds at most 1,048,576 rows, so longer exports continue on a
+    # new sheet.
+### CSV: every chunk is appended to the file.
+### Parquet: every chunk becomes a row group of the file (needs pyarrow).
+EXPORT_CHUNK_ROWS = 50_000
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def write_frame(df, path, progress=None):
+    """Writes df to an .xlsx, .csv or .parquet file one chunk of rows at a time."""
+    total = len(df)
+
+    def chunks():
+        # range(0, 1) for an empty frame, so that at least the header is written
+        for start in range(0, max(total, 1), EXPORT_CHUNK_ROWS):
+            yield df.iloc[start:start + EXPORT_CHUNK_ROWS]
+            if progress is not None:
+                progress(min(start + EXPORT_CHUNK_ROWS, total), total)
+
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as file:
+            for i, chunk in enumerate(chunks()):
+                chunk.to_csv(file, header=(i == 0), index=False)
+
+    elif path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for chunk in chunks():
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    else:
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        header = [str(column) for column in df.columns]
+        sheet = workbook.create_sheet()
+        sheet.append(header)
+        rows_in_sheet = 1
+        for chunk in chunks():
+            # Excel has no NaN, so missing values are written as empty cells
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                if rows_in_sheet == EXCEL_MAX_ROWS:
+                    sheet = workbook.create_sheet()
+                    sheet.append(header)
+                    rows_in_sheet = 1
+                sheet.append(row)
+                rows_in_sheet += 1
+        workbook.save(path)
+
+#%%
+
+def fetch_data(ticker, start_date, end_date):
+    """Fetches stock data from Yahoo Finance and saves it to an Excel file."""
+    try:
+        data = yf.download(ticker, start_date, end_date)
+        data.reset_index(inplace=True)
+        write_frame(data, "stock_data.xlsx")
+        return data
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return None
+
+# Check if stock_data.xlsx exists
+if not os.path.exists("stock_data.xlsx"):
+    initial_data = fetch_data('AAPL', dt.datetime(2023, 1, 1), dt.datetime.now())
+else:
+    # If it exists, read it into the DataFrame
+    initial_data = pd.read_excel("stock_data.xlsx")
+    
+#%%
+
+file_path = None
+    
+#%%
+# GUI Setup
+
+root = tk.Tk()
+root.title("Stock Data Analyzer")
+root.geometry('1200x600')
+
+# Main Paned Window (Vertical, for all 3 sections)
+main_paned_window = PanedWindow(root, orient=tk.VERTICAL)
+main_paned_window.pack(fill=tk.BOTH, expand=True)
+
+# Top Paned Window (Horizontal, for Data Table and Plot)
+top_paned_window = PanedWindow(main_paned_window, orient=tk.HORIZONTAL)
+
+# Data Table
+data_table = ttk.Treeview(top_paned_window)
+data_table.pack(expand=True, fill='both')
+top_paned_window.add(data_table)
+
+# Matplotlib Plot
+
+# Rasterizing a figure with several dense series (canvas.draw()) can take hundreds
+# of milliseconds, and normally it happens on the Tk thread, so the whole window
+# freezes until it is done. In background mode every draw request is handed to
+# a worker thread which rasterizes the figure with the Agg renderer. The finished
+# RGBA buffer is then blitted straight into the Tk canvas image on the Tk thread,
+# without any intermediate copy of the pixels.
+### render_lock is held whenever the figure is being changed or drawn, so the
+    # worker never draws a half-built plot.
+### Render requests carry a generation number. If several requests pile up while
+    # the worker is busy, only the newest one is rendered.
+### A finished render is shown if it is newer than the last one shown and than
+    # the last rebuild of the plot (older renders show the old plot). It doesn't
+    # have to be the newest request: while the mouse moves, every hover asks for
+    # another render, and no render would ever be shown until the mouse stops.
+### An error in a render (e.g. a bad label) is reported in a message box, and the
+    # worker carries on with the next request.
+background_render = tk.BooleanVar(value=True)  # Render in a worker thread by default
+render_lock = threading.Lock()
+render_requests = queue.Queue()   # Generations waiting to be rendered
+render_results = queue.Queue()    # Finished (generation, renderer) pairs
+render_generation = 0
+shown_generation = 0  # Generation of the render in the Tk canvas
+plot_generation = 0   # render_generation when the plot was last rebuilt
+render_error = None   # Last reported render error, so it isn't repeated on every mouse move
+
+
+class BackgroundFigureCanvas(FigureCanvasTkAgg):
+    """TkAgg canvas that can hand rasterization over to the render worker."""
+
+    def draw(self):
+        # draw() is what canvas.draw(), draw_idle() and window resizes end up calling,
+        # so the existing code and event bindings work unchanged in both modes.
+        if background_render.get():
+            request_render()
+        else:
+            with render_lock:
+                self.renderer = render_figure()
+            self.blit()
+
+
+def request_render():
+    """Asks the worker thread to rasterize the current state of the figure."""
+    global render_generation
+    render_generation += 1
+    render_requests.put(render_generation)
+
+
+def mark_new_plot():
+    """Called after the plot was rebuilt: renders requested before show the old plot."""
+    global plot_generation
+    plot_generation = render_generation
+
+
+def show_render_error(error):
+    """Reports a render which failed in the worker (runs on the Tk thread)."""
+    global render_error
+    message = f"{type(error).__name__}: {error}"
+    if message != render_error:
+        render_error = message
+        messagebox.showerror("Render failed", message)
+
+
+def render_figure():
+    """Rasterizes the figure into a new Agg renderer; the caller must hold render_lock."""
+    # Every render gets its own renderer, so a finished bitmap can be kept in the
+    # view cache without being overwritten by the next draw.
+    width, height = canvas.get_width_height(physical=True)
+    renderer = RendererAgg(width, height, fig.dpi)
+    fig.draw(renderer)
+    return renderer
+
+
+def render_worker():
+    """Rasterizes the figure with Agg whenever a render is requested."""
+    while True:
+        generation = render_requests.get()
+        while not render_requests.empty():  # Skip to the newest request
+            generation = render_requests.get()
+        try:
+            with render_lock:
+                renderer = render_figure()
+        except Exception as error:  # Keep the worker alive for the next render
+            root.after(0, show_render_error, error)
+            continue
+        render_results.put((generation, renderer))
+
+
+def poll_render_results():
+    """Blits finished renders into the Tk canvas (runs on the Tk thread)."""
+    global shown_generation, render_error
+    try:
+        while True:
+            generation, renderer = render_results.get_nowait()
+            if generation > max(shown_generation, plot_generation):  # Drop renders that are already stale
+                # blit() copies renderer.buffer_rgba() directly into the Tk photo image
+                canvas.renderer = renderer
+                canvas.blit()
+                shown_generation = generation
+                render_error = None
+            if pending_bitmap is not None and generation == pending_bitmap[0]:
+                pending_bitmap[1]['bitmap'] = renderer  # Keep the plain plot for the view cache
+    except queue.Empty:
+        pass
+    root.after(15, poll_render_results)
+
+
+fig = Figure(figsize=(5, 4), dpi=100)
+canvas = BackgroundFigureCanvas(fig, master=root)
+plot_widget = canvas.get_tk_widget()
+plot_widget.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+top_paned_window.add(plot_widget)
+
+main_paned_window.add(top_paned_window)
+
+# Statistics Table (New Pane)
+stat_table = ttk.Treeview(main_paned_window)  # Create a new Treeview for statistics
+stat_table.pack(expand=True, fill='both')
+main_paned_window.add(stat_table)  # Add statistics pane to the main pane
+
+#%%
+# View Cache
+
+# Users flip between granularities and column combinations all the time. Instead of
+# resampling and redrawing from scratch on every flip, we keep the last few views
+# in a small LRU (least recently used) cache.
+### The key is (data_version, resample_rule, columns, chart, volume, row_filter).
+    # data_version goes up every time the data changes, so views of old data can
+    # never be returned again.
+### Each entry holds the resampled dates and values of the plotted columns and,
+    # once it has been rendered, the finished bitmap of the plot.
+### An OrderedDict remembers the order in which entries were used: we move an
+    # entry to the end whenever it is used and drop entries from the front when
+    # the cache is full.
+VIEW_CACHE_SIZE = 16
+view_cache = OrderedDict()
+data_version = 0
+pending_bitmap = None  # (render generation, view) whose render should be kept
+
+
+def get_view(df, resample_rule, columns, chart='Line', volume=False, row_filter=None):
+    """Returns the cached view for these parameters, computing it if necessary."""
+    chart = chart_for(df, chart)
+    key = (data_version, resample_rule, tuple(columns), chart, volume, row_filter)
+    if key in view_cache:
+        view_cache.move_to_end(key)
+        return view_cache[key]
+
+    # Keep only the rows where the filter column is True
+    if row_filter:
+        df = df[df[row_filter].to_numpy(dtype=bool)]
+
+    # Resample data based on the selected rule
+    if chart != 'Line':
+        # Candles need all four prices, and a weekly candle is built from the first
+        # Open, highest High, lowest Low and last Close of the week (not the means)
+        columns = [column for column in OHLC_AGGREGATION if column in df.columns]
+        aggregation = {column: OHLC_AGGREGATION[column] for column in columns}
+        if resample_rule == 'D':
+            resampled_df = df[['Date'] + columns]
+        else:
+            resampled_df = df.set_index('Date')[columns].resample(resample_rule).agg(aggregation)
+            resampled_df = resampled_df.dropna(subset=OHLC_COLUMNS).reset_index()
+    elif resample_rule == 'D':
+        resampled_df = df[['Date'] + list(columns)]
+    else:
+        resampled_df = df.set_index('Date')[list(columns)].resample(resample_rule).mean().reset_index()
+
+    view = {'dates': resampled_df['Date'].to_numpy(),
+            'values': {column: resampled_df[column].to_numpy() for column in columns},
+            'bitmap': None}
+    view_cache[key] = view
+    if len(view_cache) > VIEW_CACHE_SIZE:
+        view_cache.popitem(last=False)  # Drop the least recently used view
+    return view
+
+
+def invalidate_views():
+    """Starts a new data version and drops all views of the old data."""
+    global data_version, pending_bitmap
+    data_version += 1
+    view_cache.clear()
+    derived_cache.clear()
+    risk_cache.clear()
+    pending_bitmap = None
+
+
+def drop_views_with_column(column):
+    """Drops the cached views that use the given column (or filter by it)."""
+    for key in [key for key in view_cache if column in key[2] or key[5] == column]:
+        del view_cache[key]
+    risk_cache.clear()  # The risk metrics cover every column
+
+#%%
+# Candlestick and OHLC Bar Rendering
+
+# Drawing candles one by one (a Rectangle patch and a Line2D per bar) gets very
+# slow beyond a few thousand bars, because every patch is a separate artist with
+# its own draw call. Instead we compute the shapes of all bars at once with NumPy
+# and hand them to Matplotlib as a few collections.
+### All rising bars (close >= open) are joined into one compound Path, and all
+    # falling bars into another. A compound path is a single list of vertices in
+    # which a MOVETO code starts each new shape, so no Python object is created
+    # per bar.
+### Candles: one collection with the high-low wicks and one with the open-close
+    # bodies, each holding the rising and the falling path.
+### OHLC bars: one collection with the high-low line, the open tick on the left
+    # and the close tick on the right of every bar.
+### Volume: one collection with a bar per period, in its own axes.
+### When there are more bars than pixel columns, neighbouring bars are merged
+    # (first open, highest high, lowest low, last close, total volume) with
+    # reduceat, since a bar narrower than a pixel can't be seen anyway.
+# Each collection is drawn in a single call, so 100k bars are no problem.
+# The date axis is set up with a date locator and formatter instead of
+# ax.xaxis_date(): with date units on the axis, Matplotlib would convert the
+# vertices of every path again on each draw.
+
+OHLC_COLUMNS = ['Open', 'High', 'Low', 'Close']
+OHLC_AGGREGATION = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+UP_COLOR = to_rgba('tab:green')
+DOWN_COLOR = to_rgba('tab:red')
+
+
+def compound_path(shapes, closed=False):
+    """Joins an (n, k, 2) array of n shapes with k vertices each into one Path."""
+    if closed:  # Repeat the first vertex to close every polygon
+        shapes = np.concatenate([shapes, shapes[:, :1]], axis=1)
+    n, k, _ = shapes.shape
+    codes = np.full(k, Path.LINETO, dtype=Path.code_type)
+    codes[0] = Path.MOVETO
+    if closed:
+        codes[-1] = Path.CLOSEPOLY
+    return Path(shapes.reshape(-1, 2), np.tile(codes, n))
+
+
+def up_down_collection(shapes, up, closed=False, **kwargs):
+    """Returns one collection with a rising and a falling compound path."""
+    paths = [compound_path(shapes[up], closed), compound_path(shapes[~up], closed)]
+    return PathCollection(paths, **kwargs)
+
+
+def bar_rectangles(x, width, bottom, top):
+    """Returns the corners of one rectangle per bar as an (n, 4, 2) array."""
+    left = x - width / 2
+    right = x + width / 2
+    return np.stack([left, bottom, left, top, right, top, right, bottom], axis=1).reshape(-1, 4, 2)
+
+
+def segments(x0, y0, x1, y1):
+    """Returns one line segment per bar as an (n, 2, 2) array."""
+    return np.stack([x0, y0, x1, y1], axis=1).reshape(-1, 2, 2)
+
+
+def merge_bars(x, o, h, l, c, v, n_buckets):
+    """Merges the bars into at most n_buckets bars of equal count."""
+    if len(x) <= n_buckets:
+        return x, o, h, l, c, v
+    starts = np.linspace(0, len(x), n_buckets, endpoint=False).astype(int)
+    ends = np.append(starts[1:], len(x)) - 1  # Last bar of every bucket
+    if v is not None:
+        v = np.add.reduceat(v, starts)
+    return (x[starts], o[starts], np.fmax.reduceat(h, starts), np.fmin.reduceat(l, starts),
+            c[ends], v)
+
+
+def chart_for(df, chart):
+    """Returns the chart type to draw: 'Line' if df lacks a price which candles need."""
+    if chart != 'Line' and not all(column in df.columns for column in OHLC_COLUMNS):
+        return 'Line'  # E.g. a file with only a Close column
+    return chart
+
+
+def add_ohlc_artists(ax, volume_ax, view, chart, max_bars):
+    """Adds candles (or OHLC bars) and volume bars to the axes as collections."""
+    x = mdates.date2num(view['dates'])
+    o, h, l, c = (view['values'][column].astype(float) for column in OHLC_COLUMNS)
+    v = view['values']['Volume'].astype(float) if volume_ax is not None else None
+    x, o, h, l, c, v = merge_bars(x, o, h, l, c, v, max_bars)
+    width = 0.7 * (np.median(np.diff(x)) if len(x) > 1 else 1.0)  # 70% of the bar spacing
+    up = c >= o
+    colors = [UP_COLOR, DOWN_COLOR]
+
+    wicks = segments(x, l, x, h)
+    if chart == 'Candles':
+        ax.add_collection(up_down_collection(wicks, up, facecolors='none', edgecolors=colors, linewidths=0.6), autolim=False)
+        bodies = bar_rectangles(x, width, np.minimum(o, c), np.maximum(o, c))
+        ax.add_collection(up_down_collection(bodies, up, closed=True, facecolors=colors, edgecolors='none'), autolim=False)
+    else:
+        # High-low line, open tick and close tick of a bar as one 4-vertex shape each
+        open_ticks = segments(x - width / 2, o, x, o)
+        close_ticks = segments(x, c, x + width / 2, c)
+        bars = np.concatenate([wicks, open_ticks, close_ticks], axis=1).reshape(-1, 2, 2)
+        ax.add_collection(up_down_collection(bars, np.repeat(up, 3), facecolors='none', edgecolors=colors, linewidths=0.6), autolim=False)
+
+    # The limits are set directly, which is much cheaper than autoscaling 100k shapes
+    if len(x):
+        ax.set_xlim(x[0] - width, x[-1] + width)
+        low, high = np.nanmin(l), np.nanmax(h)
+        margin = 0.02 * (high - low) if high > low else 1.0
+        ax.set_ylim(low - margin, high + margin)
+    date_locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(date_locator)
+    ax.xaxis.set_major_formatter(mdates.AutoDateFormatter(date_locator))
+
+    if volume_ax is not None:
+        volume_bars = bar_rectangles(x, width, np.zeros_like(v), v)
+        volume_colors = [UP_COLOR[:3] + (0.5,), DOWN_COLOR[:3] + (0.5,)]  # Half transparent
+        volume_ax.add_collection(up_down_collection(volume_bars, up, closed=True, facecolors=volume_colors, edgecolors='none'), autolim=False)
+        if len(v) and np.nanmax(v) > 0:
+            volume_ax.set_ylim(0, np.nanmax(v) * 1.05)
+        volume_ax.set_ylabel('Volume')
+
+#%%
+# Plot Update Function
+
+hover_cid = None  # Connection id of the current hover handler
+current_view = None  # View which is shown in the plot
+
+def update_plot(df, resample_rule='D', columns=['High'], chart='Line', volume=False, row_filter=None):
+    """Updates the plot with data from the given DataFrame and resampling rule."""
+    global pending_bitmap, current_view
+    chart = chart_for(df, chart)  # build_plot draws what the view holds
+    # Columns the data doesn't have (e.g. the default High of a file with only a
+    # Close column) are left out
+    columns = [column for column in columns if column in df.columns] or list(df.select_dtypes('number').columns[:1])
+    view = get_view(df, resample_rule, columns, chart, volume, row_filter)
+    current_view = view
+    with render_lock:  # Wait until the worker is not drawing the old plot
+        build_plot(view, resample_rule, columns, chart, volume)
+    mark_new_plot()
+
+    # If this view was rendered before at the current canvas size, its bitmap is
+    # shown right away and no rasterization is needed at all.
+    bitmap = view['bitmap']
+    size = canvas.get_width_height(physical=True)
+    if bitmap is not None and (bitmap.width, bitmap.height) == size:
+        # mark_new_plot() above drops a render of the previous view which is still
+        # in the worker instead of blitting it over this one
+        canvas.renderer = bitmap
+        canvas.blit()
+        return
+
+    canvas.draw()
+    if background_render.get():
+        pending_bitmap = (render_generation, view)  # Stored once the worker is done
+    else:
+        view['bitmap'] = canvas.renderer
+
+
+def build_plot(view, resample_rule='D', columns=['High'], chart='Line', volume=False):
+    """Builds the plot artists; the caller must hold render_lock."""
+    global hover_cid
+
+    fig.clear()
+    if chart == 'Line':
+        ax = fig.add_subplot(111)
+        for column in columns:  # Plot each selected column
+            ax.plot(view['dates'], view['values'][column], label=column)
+        ax.legend()
+    else:
+        volume_ax = None
+        if volume and 'Volume' in view['values']:
+            # Volume gets its own smaller axes below the prices, sharing the dates
+            ax, volume_ax = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+        else:
+            ax = fig.add_subplot(111)
+        max_bars = canvas.get_width_height(physical=True)[0]  # About one bar per pixel
+        add_ohlc_artists(ax, volume_ax, view, chart, max_bars)
+        
+    ax.set_title(f'Prices ({resample_rule} Granularity)')
+    fig.axes[-1].set_xlabel('Date')  # Below the volume axes if there is one
+    
+    # --- CURSOR INTERACTION ---
+    
+    # This code creates an initially hidden text box (annot) that will be used to 
+    # display information when the user hovers over the plot. 
+    # The text box is positioned slightly offset from the data point being hovered over.
+    ### Is initially empty and hidden.
+    ### Will appear 20 pixels to the left and 20 pixels above the data point being hovered over.
+    ### textcoords="offset points": This tells Matplotlib to interpret the xytext argument 
+        # as an offset from the data point in units of points (not data coordinates). 
+        # This means the annotation will always be a fixed distance away from the data point, 
+        # regardless of how the plot is zoomed or panned.
+    ### Has a rounded rectangular white background box to make the text more readable against the plot.
+    annot = ax.annotate("", xy=(0,0), xytext=(-20, 20),textcoords="offset points",
+                        bbox=dict(boxstyle="round", fc="w"))
+    annot.set_visible(False)
+
+
+    # This function update_annot positions an annotation box at the specified (x, y) 
+    # coordinates and sets its text content to a formatted string displaying the 
+    # corresponding date and numerical value.
+    def update_annot(x, y):
+        """Updates the annotation text with date and value."""
+        annot.xy = (x, y)
+        # Format x as date and y to 2 decimal places
+        # Matplotlib internally represents dates as floating-point numbers, 
+        # where each integer value represents a day and fractional values represent parts of a day.
+        # This numerical representation is often the number of days that have 
+        # passed since a specific reference point, which is usually January 1st, 1970
+        text = f"Date: {mdates.num2date(x).strftime('%Y-%m-%d')}\nValue: {y:.2f}"
+        annot.set_text(text)
+        annot.get_bbox_patch().set_alpha(0.4)
+    
+    
+    # This function hover controls the visibility of an annotation box (annot) 
+    # when the mouse hovers over the plot (ax). It updates the annotation with 
+    # the current data point's coordinates if the cursor is inside the plot area, 
+    # otherwise it hides the annotation.
+
+    def hover(event):
+        """Shows/hides the annotation based on cursor position."""
+        # If the worker is drawing right now we skip this event instead of waiting
+        # for it; the next mouse movement will update the annotation.
+        if not render_lock.acquire(blocking=False):
+            return
+        try:
+            move_annot(event)
+        finally:
+            render_lock.release()
+
+    def move_annot(event):
+        """Moves the annotation to the cursor, or hides it outside the axes."""
+        # This line gets the current visibility status (True or False) of the annotation 
+        # and stores it in the variable vis.
+        vis = annot.get_visible() # 
+        if event.inaxes == ax:
+            update_annot(event.xdata, event.ydata)
+            annot.set_visible(True)
+            fig.canvas.draw_idle()  # For an efficient and smooth plot update
+        else:
+            if vis:
+                annot.set_visible(False)
+                fig.canvas.draw_idle()
+    
+    # This line connects the hover function to the Matplotlib plot's "mouse movement" 
+    # event, triggering it whenever the mouse moves over the plot area.
+    # The previous plot's handler is disconnected first, so handlers don't pile up.
+    if hover_cid is not None:
+        fig.canvas.mpl_disconnect(hover_cid)
+    hover_cid = fig.canvas.mpl_connect("motion_notify_event", hover)
+
+    # Dragging over the plot selects a region whose statistics go to the stats pane
+    attach_brush(ax)
+
+#%%
+# Range Statistics for a Brushed Region
+
+# When the user drags over the plot, the statistics of the selected window are
+# shown in the statistics pane, updated on every mouse move. Running describe()
+# on a slice for every move would be far too slow for long histories, so we build
+# a range-query index once per view instead, and every query takes constant time:
+### Prefix sums: S[i] is the sum of the first i values. The sum of the values
+    # i..j-1 is then simply S[j] - S[i]. The same works for the count of valid
+    # values and the sum of squares, which gives mean and standard deviation.
+    # The values are shifted by their mean before squaring, to avoid losing
+    # precision when subtracting two large sums.
+### Sparse tables: level k holds the min (or max) of every window of 2**k values.
+    # Any window is covered by two overlapping windows of the same power of two,
+    # so its min is the smaller of two table entries.
+### For the return we need the first and last valid value in the window, which
+    # we look up in precomputed "next valid" and "previous valid" positions.
+# Finding the rows under the brush is a binary search on the sorted dates.
+
+RANGE_STATS = ['count', 'mean', 'std', 'min', 'max', 'return']
+span_selector = None  # Kept in a variable, otherwise it is garbage collected
+
+
+class RangeIndex:
+    """Answers count/mean/std/min/max/return queries for any slice of one column."""
+
+    def __init__(self, values):
+        v = np.asarray(values, dtype=float)
+        valid = ~np.isnan(v)
+        self.values = v
+        self.shift = v[valid].mean() if valid.any() else 0.0
+        shifted = np.where(valid, v - self.shift, 0.0)
+        self.count = np.concatenate([[0], np.cumsum(valid)])
+        self.sum = np.concatenate([[0.0], np.cumsum(shifted)])
+        self.sum_sq = np.concatenate([[0.0], np.cumsum(shifted * shifted)])
+
+        # Level k is built from level k-1: min(window at i, window at i + 2**(k-1))
+        self.mins, self.maxs = [v], [v]
+        half = 1
+        while 2 * half <= len(v):
+            self.mins.append(np.fmin(self.mins[-1][:-half], self.mins[-1][half:]))
+            self.maxs.append(np.fmax(self.maxs[-1][:-half], self.maxs[-1][half:]))
+            half *= 2
+
+        positions = np.arange(len(v))
+        self.prev_valid = np.maximum.accumulate(np.where(valid, positions, -1))
+        self.next_valid = np.minimum.accumulate(np.where(valid, positions, len(v))[::-1])[::-1]
+
+    def query(self, i, j):
+        """Returns the statistics of the values i..j-1 (needs i < j)."""
+        i, j = int(i), int(j)  # np.searchsorted gives numpy ints, which have no bit_length()
+        count = self.count[j] - self.count[i]
+        if count == 0:
+            return [0] + [np.nan] * (len(RANGE_STATS) - 1)
+        total = self.sum[j] - self.sum[i]
+        mean = total / count
+        std = np.nan
+        if count > 1:  # Sample standard deviation, like describe()
+            variance = (self.sum_sq[j] - self.sum_sq[i] - total * mean) / (count - 1)
+            std = np.sqrt(max(variance, 0.0))
+
+        k = (j - i).bit_length() - 1  # Largest power of two that fits into the window
+        low = np.fmin(self.mins[k][i], self.mins[k][j - 2 ** k])
+        high = np.fmax(self.maxs[k][i], self.maxs[k][j - 2 ** k])
+
+        first = self.values[self.next_valid[i]]
+        last = self.values[self.prev_valid[j - 1]]
+        return [count, mean + self.shift, std, low, high, last / first - 1]
+
+
+def range_index(view, column):
+    """Returns the range index of one column of a view, building it on first use."""
+    indexes = view.setdefault('range_index', {})
+    if column not in indexes:
+        indexes[column] = RangeIndex(view['values'][column])
+    return indexes[column]
+
+
+def attach_brush(ax):
+    """Lets the user select a date range on the axes by dragging."""
+    global span_selector
+    detach_brush()
+    span_selector = SpanSelector(ax, show_range_statistics, 'horizontal', onmove_callback=show_range_statistics,
+                                 props=dict(alpha=0.2, facecolor='tab:blue'))
+
+
+def detach_brush():
+    """Disconnects the brush of the previous plot."""
+    global span_selector
+    if span_selector is not None:
+        span_selector.disconnect_events()
+        span_selector = None
+
+
+def show_range_statistics(xmin, xmax):
+    """Fills the statistics pane with the statistics of the brushed dates."""
+    view = current_view
+    if view is None:
+        return
+    if 'x' not in view:
+        view['x'] = mdates.date2num(view['dates'])  # Dates as the plot's numbers
+    i = np.searchsorted(view['x'], xmin, side='left')
+    j = np.searchsorted(view['x'], xmax, side='right')
+    if j <= i:
+        return
+
+    columns = list(view['values'])
+    stats = {column: range_index(view, column).query(i, j) for column in columns}
+
+    # Clear previous treeview
+    for item in stat_table.get_children():
+        stat_table.delete(item)
+
+    # Set up new treeview (one row per statistic, one column per data column)
+    stat_table["column"] = [""] + columns
+    stat_table["show"] = "headings"
+    for column in stat_table["column"]:
+        stat_table.heading(column, text=column)
+        stat_table.column(column, anchor='center')
+    for row, name in enumerate(RANGE_STATS):
+        stat_table.insert("", "end", values=[name] + [f"{stats[column][row]:.2f}" for column in columns])
+
+#%%
+# Local Data Store
+
+# The data store is a folder with one sub-folder per ticker, and one .npy file per
+# column inside it (Date is stored as int64 nanoseconds since 1970). A .npy file
+# can be opened memory-mapped: np.load(..., mmap_mode='r') returns an array
+# without reading the file, and only the parts of it which are actually used are
+# loaded from disk. So reading the last 200 closes of a ticker only touches the end
+# of one file, no matter how long its history is. A columns.txt file keeps the
+# original order of the columns.
+DATA_STORE = 'data_store'
+
+
+def store_ticker(ticker, df, store=DATA_STORE):
+    """Saves the Date and numeric columns of df as a ticker in the data store."""
+    folder = os.path.join(store, ticker)
+    os.makedirs(folder, exist_ok=True)
+    np.save(os.path.join(folder, 'Date.npy'), df['Date'].to_numpy(dtype='datetime64[ns]').view('int64'))
+    columns = list(df.select_dtypes('number').columns)
+    for column in columns:
+        np.save(os.path.join(folder, f'{column}.npy'), df[column].to_numpy(dtype=float))
+    with open(os.path.join(folder, 'columns.txt'), 'w') as file:
+        file.write('\n'.join(['Date'] + columns))
+
+
+def store_tickers(store=DATA_STORE):
+    """Returns the names of all tickers in the data store."""
+    if not os.path.isdir(store):
+        return []
+    return sorted(name for name in os.listdir(store) if os.path.isdir(os.path.join(store, name)))
+
+
+def store_columns(folder):
+    """Returns the column names of a ticker folder in the data store."""
+    if os.path.exists(os.path.join(folder, 'columns.txt')):
+        with open(os.path.join(folder, 'columns.txt')) as file:
+            return file.read().splitlines()
+    return [name[:-4] for name in sorted(os.listdir(folder)) if name.endswith('.npy')]
+
+
+def load_store_ticker(folder):
+    """Reads all columns of a ticker folder from the data store into a DataFrame."""
+    data = {column: np.load(os.path.join(folder, f'{column}.npy')) for column in store_columns(folder)}
+    data['Date'] = pd.to_datetime(data['Date'])  # int64 nanoseconds to datetime
+    return pd.DataFrame(data)
+
+#%%
+# Data Loading and Display Function
+
+# The loaded data is kept in memory, so changing the granularity or the columns
+# doesn't read the file again. We remember the file's modification time to notice
+# when the file has changed on disk.
+current_df = None
+file_mtime = None
+
+
+def read_data(path):
+    """Reads a CSV or Excel file (or a data store ticker) and stores it as the current dataset."""
+    global current_df, file_mtime
+    if os.path.isdir(path):
+        df = load_store_ticker(path)
+    else:
+        if path.endswith('.csv'):
+            df = pd.read_csv(path)
+        else:
+            df = pd.read_excel(path)
+
+        # Convert Date Column from String to Datetime
+        df['Date'] = pd.to_datetime(df['Date'],format='%Y-%m-%d')
+
+    current_df = df
+    file_mtime = os.path.getmtime(path)
+    invalidate_views()
+
+    # Compute the derived columns again for the new data
+    for name, expression in derived_columns.items():
+        try:
+            df[name] = evaluate_expression(df, expression)
+        except (ValueError, KeyError, SyntaxError, TypeError) as e:
+            print(f"Could not compute derived column {name}: {e}")
+    return df
+
+
+def load_data():
+    global file_path, comparison_mode
+    file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv")])
+    if file_path:
+        df = read_data(file_path)
+        comparison_mode = False  # Back to the single plot
+        show_data(df)
+
+
+def show_data(df):
+    """Shows a freshly loaded DataFrame in the data table and the plot."""
+    # Clear previous Table
+    for i in data_table.get_children():
+        data_table.delete(i)
+
+    # Set up new Table
+    data_table["column"] = list(df.columns)
+    data_table["show"] = "headings"
+    for column in data_table["column"]:
+        data_table.heading(column, text=column)
+        data_table.column(column, anchor='center')
+
+    df_rows = df.map(lambda x: f"{x:.2f}" if isinstance(x, (int, float)) else x).to_numpy().tolist()
+    for row in df_rows:
+        data_table.insert("", "end", values=row)
+    
+    update_plot(df, selected_granularity.get(), chart=chart_type.get(), volume=show_volume.get(),
+                row_filter=selected_filter())
+
+#%%
+# Risk Analytics
+
+# Below the describe() statistics, the statistics pane shows risk metrics for every
+# numeric column:
+### total log return: the sum of all log returns, log(last price / first price)
+### annual return: the average log return per period, scaled to a year
+### annual volatility: the standard deviation of the log returns, scaled to a year
+    # (with the square root of the number of periods per year)
+### max drawdown: the largest drop from a previous peak, e.g. -0.25 for -25%
+### sharpe ratio: annual return above the risk free rate per unit of volatility
+# All columns are handled at once: the prices form one 2D array (rows = dates,
+# columns = data columns), and np.diff, np.log and np.fmax.accumulate (the running
+# peak) work along the rows for every column in a single call, without any Python
+# loop over the rows.
+# The metrics are computed for the daily data and for the selected granularity,
+# where each period is represented by its last price. The results are cached per
+# data_version, granularity and filter.
+
+PERIODS_PER_YEAR = {'D': 252, 'W': 52, 'M': 12}
+RISK_FREE_RATE = 0.0
+RISK_METRICS = ['total log return', 'annual return', 'annual volatility', 'max drawdown', 'sharpe ratio']
+risk_cache = {}  # (data_version, resample_rule, row_filter) -> DataFrame of metrics
+
+
+def risk_metrics(df, resample_rule='D', row_filter=None):
+    """Returns a DataFrame with one row per risk metric and one column per numeric column."""
+    key = (data_version, resample_rule, row_filter)
+    if key in risk_cache:
+        return risk_cache[key]
+
+    if row_filter:
+        df = df[df[row_filter].to_numpy(dtype=bool)]
+    prices = df.set_index('Date').select_dtypes('number')
+    if resample_rule != 'D':
+        prices = prices.resample(resample_rule).last()
+    values = prices.to_numpy(dtype=float)
+    periods = PERIODS_PER_YEAR.get(resample_rule, 252)
+
+    # Columns without any valid return (or with zero or negative values) give NaN
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        log_returns = np.diff(np.log(values), axis=0)
+        log_returns[~np.isfinite(log_returns)] = np.nan
+        mean = np.nanmean(log_returns, axis=0)
+        annual_volatility = np.nanstd(log_returns, axis=0, ddof=1) * np.sqrt(periods)
+        running_peak = np.fmax.accumulate(values, axis=0)
+        max_drawdown = np.nanmin(values / running_peak - 1, axis=0)
+        sharpe = (mean * periods - RISK_FREE_RATE) / annual_volatility
+        metrics = [np.nansum(log_returns, axis=0), np.expm1(mean * periods), annual_volatility, max_drawdown, sharpe]
+
+    result = pd.DataFrame(metrics, index=[f"{metric} ({resample_rule})" for metric in RISK_METRICS],
+                          columns=prices.columns)
+    risk_cache[key] = result
+    return result
+
+#%%
+# Statistics Calculation and Display Function
+
+def load_statistics():
+    if current_df is not None:
+        row_filter = selected_filter()
+        df = current_df
+        if row_filter:
+            df = df[df[row_filter].to_numpy(dtype=bool)]
+        df = df.drop('Date',axis=1).describe()
+
+        # Risk metrics for the daily data and, if another one is selected, for the
+        # selected granularity
+        granularities = ['D'] if selected_granularity.get() == 'D' else ['D', selected_granularity.get()]
+        df = pd.concat([df] + [risk_metrics(current_df, rule, row_filter) for rule in granularities])
+        df = df.reset_index()
+        df.rename(columns={"index": ""}, inplace=True)
+
+        # Clear previous treeview
+        for i in stat_table.get_children():
+            stat_table.delete(i)
+
+        # Set up new treeview
+        stat_table["column"] = list(df.columns)
+        stat_table["show"] = "headings"
+        for column in stat_table["column"]:
+            stat_table.heading(column, text=column)
+            stat_table.column(column, anchor='center')
+
+        # Insert data into treeview
+        df_rows = df.map(lambda x: f"{x:.2f}" if isinstance(x, (int, float)) else x).to_numpy().tolist()
+        for row in df_rows:
+            stat_table.insert("", "end", values=row)
+
+#%%
+# Resampling Function
+
+def select_granularity():
+    global file_path
+    if comparison_mode:  # Granularity and columns apply to every panel
+        update_comparison_plot()
+    elif file_path and os.path.exists(file_path):
+        df = current_df
+        if os.path.getmtime(file_path) != file_mtime:  # File changed on disk
+            df = read_data(file_path)
+        
+        # Get selected columns from the Listbox
+        selected_columns = [column_listbox.get(i) for i in column_listbox.curselection()]
+        if not selected_columns:
+            selected_columns = ['High']  # Default if nothing selected
+        
+        update_plot(df, selected_granularity.get(), selected_columns, chart_type.get(), show_volume.get(),
+                    selected_filter())
+        
+
+#%%
+# Derived Columns
+
+# Derived columns are computed from the existing ones with an expression, e.g.
+#   Change = (Close - Open) / Open
+#   Breakout = High > 1.02 * Close
+# Instead of calling a Python function for every single value (as with
+# df['x'].map(lambda x: x*x) in Lambda_Function.py), the whole expression is
+# evaluated column-wise by pandas.eval, which works on complete NumPy arrays (and
+# uses numexpr when it is installed).
+### Before evaluating, the expression is parsed with the ast module, and only
+    # numbers, column names, arithmetic, comparisons and and/or/not are allowed.
+    # Function calls, attribute access etc. are rejected, so an expression can't
+    # run arbitrary code.
+### Column names with spaces can be written in backticks, e.g. `Adj Close`.
+### Results are cached by (hash of the parsed expression and its columns,
+    # data_version, versions of its columns), so the same expression is never
+    # evaluated twice on the same data. A derived column gets a new version
+    # whenever it is written, so an expression using it is evaluated again.
+### When a derived column is redefined, the derived columns computed from it are
+    # computed again (in the order they were added), and the cached views of all
+    # of them are dropped.
+### Derived columns are added to the DataFrame and the column Listbox, so they can
+    # be plotted, exported and used for statistics like any other column. A derived
+    # column with True/False values can also be used as a filter.
+
+ALLOWED_NODES = (ast.Expression, ast.Load, ast.Name, ast.Constant,
+                 ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+                 ast.UnaryOp, ast.UAdd, ast.USub, ast.Not, ast.Invert,
+                 ast.BoolOp, ast.And, ast.Or, ast.BitAnd, ast.BitOr,
+                 ast.Compare, ast.Gt, ast.GtE, ast.Lt, ast.LtE, ast.Eq, ast.NotEq)
+NO_FILTER = '(none)'
+derived_columns = {}  # Name -> expression, in the order they were added
+derived_cache = {}    # (expression hash, data_version, column versions) -> result array
+column_versions = {}  # Derived column name -> number of times it was written
+
+
+def parse_expression(expression, columns):
+    """Checks an expression and returns (tree, {identifier: column name})."""
+    names = {}
+
+    def replace_backticks(match):
+        identifier = f"__col{len(names)}"
+        names[identifier] = match.group(1)
+        return identifier
+
+    tree = ast.parse(re.sub(r"`([^`]+)`", replace_backticks, expression.strip()), mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"'{type(node).__name__}' is not allowed in an expression")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numbers are allowed as constants, not {node.value!r}")
+        if isinstance(node, ast.Name) and node.id not in names:
+            names[node.id] = node.id
+    for identifier, column in names.items():
+        if column not in columns:
+            raise KeyError(f"Unknown column: {column}")
+    return tree, names
+
+
+def evaluate_expression(df, expression):
+    """Evaluates the expression on whole columns of df (cached)."""
+    tree, names = parse_expression(expression, df.columns)
+    # ast.dump ignores spaces and brackets that don't matter, so '(Close-Open)'
+    # and 'Close - Open' share a cache entry. The columns behind the identifiers
+    # are part of the key: `Adj Close` and `Close` both become __col0.
+    parsed = ast.dump(tree) + repr(sorted(names.items()))
+    versions = tuple(column_versions.get(column, 0) for _, column in sorted(names.items()))
+    key = (hashlib.sha1(parsed.encode()).hexdigest(), data_version, versions)
+    if key not in derived_cache:
+        arrays = {identifier: df[column].to_numpy() for identifier, column in names.items()}
+        result = np.asarray(pd.eval(ast.unparse(tree), local_dict=arrays))
+        if result.ndim == 0:  # A constant expression gives a single value
+            result = np.full(len(df), result)
+        derived_cache[key] = result
+    return derived_cache[key]
+
+
+def add_derived_column():
+    """Adds (or replaces) the derived column typed as 'Name = expression'."""
+    if current_df is None:
+        return
+    name, equals, expression = derived_entry.get().partition('=')
+    name = name.strip()
+    if not equals or not name or not expression.strip():
+        messagebox.showerror("Invalid expression", "Please write the column as 'Name = expression'.")
+        return
+    try:
+        result = evaluate_expression(current_df, expression)
+    except (ValueError, KeyError, SyntaxError, TypeError) as e:  # TypeError: e.g. ~ on floats
+        messagebox.showerror("Invalid expression", str(e))
+        return
+
+    derived_columns[name] = expression
+    write_derived_column(name, result)
+    if name not in column_listbox.get(0, tk.END):
+        column_listbox.insert(tk.END, name)
+
+    # Compute the derived columns which use this one (directly or through others)
+    # again; the ones which can't be computed anymore are removed
+    changed, failed = {name}, []
+    for other, other_expression in list(derived_columns.items()):
+        if other in changed:
+            continue
+        try:
+            _, names = parse_expression(other_expression, current_df.columns)
+            if changed.isdisjoint(names.values()):
+                continue
+            write_derived_column(other, evaluate_expression(current_df, other_expression))
+        except (ValueError, KeyError, SyntaxError, TypeError) as e:
+            failed.append(f"{other}: {e}")
+            del derived_columns[other]
+            current_df.drop(columns=other, inplace=True)
+            drop_views_with_column(other)
+            column_listbox.delete(column_listbox.get(0, tk.END).index(other))
+        changed.add(other)
+    if failed:
+        messagebox.showwarning("Derived columns removed", "These derived columns could not be computed "
+                               "from the new definition and were removed:\n" + "\n".join(failed))
+    # Columns with True/False values can be used as filters
+    filter_box['values'] = [NO_FILTER] + [column for column in derived_columns
+                                          if current_df[column].dtype == bool]
+    select_granularity()
+
+
+def write_derived_column(name, result):
+    """Stores a derived column in current_df and drops what was computed from its old values."""
+    current_df[name] = result
+    column_versions[name] = column_versions.get(name, 0) + 1
+    drop_views_with_column(name)
+
+
+def selected_filter():
+    """Returns the name of the filter column, or None if no filter is selected."""
+    row_filter = filter_column.get()
+    if row_filter == NO_FILTER or current_df is None or row_filter not in current_df.columns:
+        return None
+    return row_filter
+
+
+#%%
+# Comparison View (Small Multiples)
+
+# To compare many tickers, we lay them out as a grid of small plots (one ticker
+# per panel) which all share the same x-axis. Every ticker is loaded from its own
+# file, and the file name is used as the ticker name.
+### All selected columns of a panel go into one LineCollection, so each panel is a
+    # single artist instead of one Line2D per column.
+### Long series are decimated to the min and max of about one bucket per pixel
+    # column, which keeps peaks and dips visible with far fewer points.
+### All panels are cells of a single Axes which has no axis of its own. Every
+    # Axes comes with spines, ticks and labels which take milliseconds each to
+    # create and draw, so 50 separate Axes took about a second to lay out. The
+    # lines of a panel are mapped into its cell by an Affine2D transform from the
+    # shared date range and the panel's own value range, so no autoscaling is needed.
+### The frames and tick marks of all panels are one more LineCollection, and the
+    # tick labels are plain texts: about 3 values per panel (MaxNLocator), and the
+    # date ticks, which are computed once for the shared date range and shown below
+    # the lowest panel of each column.
+### The whole figure is drawn once after all panels are built.
+### With "Rebase to 100" every series is divided by its first value, so tickers
+    # with very different prices can be compared with each other.
+
+comparison_data = {}  # Ticker -> DataFrame, in the order the files were picked
+comparison_version = 0  # Goes up whenever a new set of tickers is loaded
+comparison_mode = False
+PANEL_GAPS = (0.2, 0.14, 0.03, 0.05)  # Left, bottom, right and top space in a cell, for the labels
+rebase_prices = tk.BooleanVar(value=False)
+
+
+def decimate(x, y, n_buckets):
+    """Reduces a series to the min and max of each of n_buckets equal buckets."""
+    if len(x) <= 2 * n_buckets:
+        return x, y
+    starts = np.linspace(0, len(x), n_buckets, endpoint=False).astype(int)
+    # reduceat computes the min/max of every slice y[starts[i]:starts[i+1]] in one call
+    y_min = np.fmin.reduceat(y, starts)
+    y_max = np.fmax.reduceat(y, starts)
+    return np.repeat(x[starts], 2), np.column_stack([y_min, y_max]).ravel()
+
+
+def load_comparison():
+    """Loads one file per ticker and shows them side by side."""
+    global comparison_mode, comparison_version
+    paths = filedialog.askopenfilenames(filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv")])
+    if paths:
+        comparison_data.clear()
+        comparison_version += 1
+        for path in paths:
+            ticker = os.path.splitext(os.path.basename(path))[0]
+            if path.endswith('.csv'):
+                df = pd.read_csv(path)
+            else:
+                df = pd.read_excel(path)
+            df['Date'] = pd.to_datetime(df['Date'],format='%Y-%m-%d')
+            comparison_data[ticker] = df
+        comparison_mode = True
+        update_comparison_plot()
+
+
+def add_panels(panels, n_cols, x_min, x_max, colors):
+    """Draws the panels (ticker, segments, y_min, y_max) as the cells of one Axes."""
+    n_rows = math.ceil(len(panels) / n_cols)
+    ax = fig.add_axes([0.03, 0.04, 0.96, 0.9])
+    ax.set_axis_off()
+    cell_width, cell_height = 1 / n_cols, 1 / n_rows
+    gap_left, gap_bottom, gap_right, gap_top = PANEL_GAPS
+    width = cell_width * (1 - gap_left - gap_right)
+    height = cell_height * (1 - gap_bottom - gap_top)
+    tick_x, tick_y = 0.1 * gap_left * cell_width, 0.1 * gap_bottom * cell_height
+
+    # The date ticks are the same for every column
+    date_locator = mdates.AutoDateLocator(minticks=2, maxticks=4)
+    date_ticks = date_locator.tick_values(mdates.num2date(x_min), mdates.num2date(x_max))
+    date_ticks = date_ticks[(date_ticks >= x_min) & (date_ticks <= x_max)]
+    date_texts = mdates.ConciseDateFormatter(date_locator).format_ticks(date_ticks)
+    date_offsets = (date_ticks - x_min) / (x_max - x_min) * width
+
+    marks = []  # Frames and tick marks of all panels, in axes coordinates
+    for i, (ticker, segments, y_min, y_max) in enumerate(panels):
+        row, column = divmod(i, n_cols)
+        left = (column + gap_left) * cell_width
+        bottom = (n_rows - 1 - row + gap_bottom) * cell_height
+        if y_min == y_max:
+            y_min, y_max = y_min - 1, y_max + 1
+
+        # Data coordinates of the panel -> its cell of the Axes
+        to_cell = (Affine2D().translate(-x_min, -y_min)
+                   .scale(width / (x_max - x_min), height / (y_max - y_min))
+                   .translate(left, bottom) + ax.transAxes)
+        lines = LineCollection(segments, colors=colors, linewidths=0.8, transform=to_cell)
+        lines.set_clip_box(TransformedBbox(Bbox.from_bounds(left, bottom, width, height), ax.transAxes))
+        ax.add_collection(lines, autolim=False)
+        marks.append([(left, bottom), (left + width, bottom), (left + width, bottom + height),
+                      (left, bottom + height), (left, bottom)])
+        # A label inside the panel is much cheaper to lay out than a title
+        ax.text(left + 0.02 * width, bottom + 0.95 * height, ticker, transform=ax.transAxes, fontsize=7, va='top')
+
+        for value in MaxNLocator(3).tick_values(y_min, y_max):
+            if y_min <= value <= y_max:
+                y = bottom + (value - y_min) / (y_max - y_min) * height
+                marks.append([(left - tick_x, y), (left, y)])
+                ax.text(left - 1.5 * tick_x, y, f"{value:g}", transform=ax.transAxes, fontsize=6, ha='right', va='center')
+        if i + n_cols >= len(panels):  # Lowest panel of its column
+            for offset, text in zip(date_offsets, date_texts):
+                marks.append([(left + offset, bottom), (left + offset, bottom - tick_y)])
+                ax.text(left + offset, bottom - 1.5 * tick_y, text, transform=ax.transAxes, fontsize=6, ha='center', va='top')
+    ax.add_collection(LineCollection(marks, colors='black', linewidths=0.6, transform=ax.transAxes), autolim=False)
+    return ax
+
+
+def update_comparison_plot():
+    """Draws every loaded ticker into its own panel of a shared-x grid."""
+    global hover_cid
+    if not comparison_data:
+        return
+    resample_rule = selected_granularity.get()
+    columns = [column_listbox.get(i) for i in column_listbox.curselection()]
+    if not columns:
+        columns = ['High']  # Default if nothing selected
+
+    n = len(comparison_data)
+    n_cols = math.ceil(math.sqrt(n))
+    width, _ = canvas.get_width_height(physical=True)
+    n_buckets = max(width // n_cols, 50)
+    colors = [f'C{i}' for i in range(len(columns))]
+
+    with render_lock:
+        # The single-plot hover annotation and brush don't apply to the grid
+        if hover_cid is not None:
+            fig.canvas.mpl_disconnect(hover_cid)
+            hover_cid = None
+        detach_brush()
+
+        fig.clear()
+        panels = []  # (ticker, segments, y_min, y_max)
+        x_min, x_max = np.inf, -np.inf
+        for ticker, df in comparison_data.items():
+            if resample_rule != 'D':
+                df = df.set_index('Date')[columns].resample(resample_rule).mean().reset_index()
+            x = mdates.date2num(df['Date'].to_numpy())
+            segments = []
+            for column in columns:
+                y = df[column].to_numpy(dtype=float)
+                if rebase_prices.get():
+                    valid = y[~np.isnan(y)]
+                    if valid.size:
+                        y = y / valid[0] * 100
+                segments.append(np.column_stack(decimate(x, y, n_buckets)))
+            y_all = np.concatenate([segment[:, 1] for segment in segments])
+            y_all = y_all[~np.isnan(y_all)]
+            y_range = (y_all.min(), y_all.max()) if y_all.size else (0.0, 1.0)
+            panels.append((ticker, segments, *y_range))
+            if x.size:
+                x_min, x_max = min(x_min, x.min()), max(x_max, x.max())
+        if not x_min < x_max:  # No dates, or a single one
+            x_min, x_max = (0.0, 1.0) if np.isinf(x_min) else (x_min - 1, x_min + 1)
+        add_panels(panels, n_cols, x_min, x_max, colors)
+        fig.suptitle(f"{', '.join(columns)} ({resample_rule} Granularity)"
+                     + (", rebased to 100" if rebase_prices.get() else ""), fontsize=9)
+    mark_new_plot()
+    canvas.draw()
+
+
+#%%
+# Correlation and Covariance Matrices
+
+# The analytics window compares the returns of all tickers loaded with "Compare
+# Tickers" at once, as a heatmap of their correlation (or covariance) matrix.
+### Alignment: the prices of all tickers are joined on their dates into one 2D
+    # array (rows = dates, columns = tickers), with NaN where a ticker has no price.
+    # This is done once per set of tickers and price column, and then cached.
+### Missing values: every pair of tickers only uses the dates where both have a
+    # return. With a 0/1 matrix M of valid values and X the returns with 0 where
+    # missing, all the pairwise sums come out of four matrix products:
+        # n = M'M (counts), S = X'M (sums), Q = (X*X)'M (sums of squares), C = X'X.
+    # Matrix products run in optimized BLAS code, so 500+ tickers are no problem.
+### Rolling window: the window can be limited to the last N days before a chosen
+    # end date. When the end date slider moves by a few days, the sums are updated
+    # with the rows which enter and leave the window instead of being recomputed.
+
+alignment_cache = {}  # (comparison_version, column) -> (dates, tickers, returns)
+
+
+def aligned_returns(column):
+    """Returns the dates, tickers and log returns of all comparison tickers (or None)."""
+    key = (comparison_version, column)
+    if key not in alignment_cache:
+        alignment_cache.clear()  # Only the newest alignment is kept
+        series = []
+        for ticker, df in comparison_data.items():
+            if column in df.columns:
+                prices = df.set_index('Date')[column].rename(ticker)
+                series.append(prices[~prices.index.duplicated()])
+        if not series:
+            return None  # None of the tickers has this column
+        prices = pd.concat(series, axis=1, sort=True)  # Outer join on the dates
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.diff(np.log(prices.to_numpy(dtype=float)), axis=0)
+        returns[~np.isfinite(returns)] = np.nan
+        alignment_cache[key] = (prices.index[1:].to_numpy(), list(prices.columns), returns)
+    return alignment_cache[key]
+
+
+class WindowMoments:
+    """Pairwise sums of the returns over a window of rows, updated incrementally."""
+
+    def __init__(self, returns):
+        valid = ~np.isnan(returns)
+        self.x = np.where(valid, returns, 0.0)
+        self.m = valid.astype(float)
+        self.start = self.end = 0
+        n_tickers = returns.shape[1]
+        self.n, self.s, self.q, self.c = (np.zeros((n_tickers, n_tickers)) for _ in range(4))
+
+    def update(self, start, end, sign):
+        """Adds (sign=1) or removes (sign=-1) the rows start..end-1."""
+        if end <= start:
+            return
+        x, m = self.x[start:end], self.m[start:end]
+        self.n += sign * (m.T @ m)
+        self.s += sign * (x.T @ m)
+        self.q += sign * ((x * x).T @ m)
+        self.c += sign * (x.T @ x)
+
+    def move_to(self, start, end):
+        """Moves the window to the rows start..end-1."""
+        changed_rows = abs(start - self.start) + abs(end - self.end)
+        if start >= self.start and end >= self.end and changed_rows < end - start:
+            self.update(self.end, end, 1)        # Rows entering the window
+            self.update(self.start, start, -1)   # Rows leaving the window
+        else:  # A big jump is cheaper to compute from scratch
+            for matrix in (self.n, self.s, self.q, self.c):
+                matrix[:] = 0
+            self.update(start, end, 1)
+        self.start, self.end = start, end
+
+    def matrices(self):
+        """Returns the covariance and correlation matrices of the window."""
+        n = self.n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = (self.c - self.s * self.s.T / n) / (n - 1)
+            # variance[i, j]: variance of ticker i on the dates where j is valid too
+            variance = (self.q - self.s ** 2 / n) / (n - 1)
+            correlation = covariance / np.sqrt(variance * variance.T)
+        covariance[n < 2] = np.nan
+        correlation[n < 2] = np.nan
+        return covariance, np.clip(correlation, -1, 1)
+
+
+def open_correlation_window():
+    """Opens a window with the correlation heatmap of the comparison tickers."""
+    if not comparison_data:
+        messagebox.showinfo("Correlations", "Please load some tickers with 'Compare Tickers' first.")
+        return
+
+    window = tk.Toplevel(root)
+    window.title("Correlation Matrix")
+    window.geometry('800x700')
+
+    controls = tk.Frame(window)
+    controls.pack(pady=5)
+    matrix_fig = Figure(figsize=(6, 5), dpi=100)
+    matrix_canvas = FigureCanvasTkAgg(matrix_fig, master=window)
+    matrix_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    matrix_kind = tk.StringVar(value='Correlation')
+    price_column = tk.StringVar(value='Close')
+    window_length = tk.StringVar(value='0')  # 0 means the whole history
+    window_end = tk.IntVar(value=0)
+    state = {'returns': None, 'moments': None, 'image': None, 'kind': None}
+
+    def refresh(*args):
+        """Recomputes the matrix for the current settings and redraws the heatmap."""
+        alignment = aligned_returns(price_column.get())
+        if alignment is None:
+            messagebox.showinfo("Correlations", f"None of the compared tickers has a {price_column.get()} column.")
+            return
+        dates, tickers, returns = alignment
+        if len(returns) < 2:
+            return
+        if state['returns'] is not returns:  # New alignment: start from scratch
+            state['returns'] = returns
+            state['moments'] = WindowMoments(returns)
+            state['image'] = None
+            end_scale.config(to=len(returns))
+            window_end.set(len(returns))
+
+        end = min(max(window_end.get(), 1), len(returns))
+        try:
+            length = int(window_length.get())
+        except ValueError:
+            length = 0
+        start = 0 if length <= 0 else max(end - length, 0)
+        state['moments'].move_to(start, end)
+        covariance, correlation = state['moments'].matrices()
+        end_label.config(text=f"Window end: {pd.Timestamp(dates[end - 1]):%Y-%m-%d}")
+
+        if matrix_kind.get() == 'Correlation':
+            matrix, limit = correlation, 1.0
+        else:
+            matrix = covariance
+            limit = np.nanmax(np.abs(covariance)) if np.isfinite(covariance).any() else 1.0
+
+        # The heatmap is only built once; later updates just replace its data
+        if state['image'] is None or state['kind'] != matrix_kind.get():
+            matrix_fig.clear()
+            ax = matrix_fig.add_subplot(111)
+            state['image'] = ax.imshow(matrix, cmap='RdBu_r', vmin=-limit, vmax=limit, interpolation='nearest')
+            state['kind'] = matrix_kind.get()
+            matrix_fig.colorbar(state['image'], ax=ax)
+            if len(tickers) <= 40:  # Names are unreadable for more tickers
+                ax.set_xticks(range(len(tickers)), tickers, rotation=90, fontsize=7)
+                ax.set_yticks(range(len(tickers)), tickers, fontsize=7)
+        else:
+            state['image'].set_data(matrix)
+            state['image'].set_clim(-limit, limit)
+        state['image'].axes.set_title(f"{matrix_kind.get()} of {price_column.get()} log returns "
+                                      f"({end - start} days, {len(tickers)} tickers)", fontsize=9)
+        matrix_canvas.draw_idle()
+
+    ttk.Label(controls, text="Matrix:").pack(side=tk.LEFT, padx=5)
+    kind_box = ttk.Combobox(controls, textvariable=matrix_kind, values=['Correlation', 'Covariance'], state='readonly', width=12)
+    kind_box.pack(side=tk.LEFT, padx=5)
+    kind_box.bind("<<ComboboxSelected>>", refresh)
+    ttk.Label(controls, text="Prices:").pack(side=tk.LEFT, padx=5)
+    column_box = ttk.Combobox(controls, textvariable=price_column, values=['Open', 'High', 'Low', 'Close'], state='readonly', width=8)
+    column_box.pack(side=tk.LEFT, padx=5)
+    column_box.bind("<<ComboboxSelected>>", refresh)
+    ttk.Label(controls, text="Rolling Window (days, 0 = all):").pack(side=tk.LEFT, padx=5)
+    length_box = ttk.Spinbox(controls, textvariable=window_length, from_=0, to=100000, increment=20, width=7, command=refresh)
+    length_box.pack(side=tk.LEFT, padx=5)
+    length_box.bind("<Return>", refresh)
+    end_scale = tk.Scale(controls, variable=window_end, from_=1, to=1, orient=tk.HORIZONTAL, showvalue=False, length=200,
+                         command=refresh)
+    end_scale.pack(side=tk.LEFT, padx=5)
+    end_label = ttk.Label(controls, text="")
+    end_label.pack(side=tk.LEFT, padx=5)
+
+    refresh()
+
+#%%
+# Worker Processes
+
+# CPU heavy work on many tickers is spread over all cores with a process pool.
+# The workers are new interpreters (forkserver, or spawn e.g. on Windows), not
+# forks of this process with its Tk and render threads, so they work the same on
+# every platform. When a worker starts, it loads the functions of this script
+# (see Worker_Tasks.py), and tasks are sent to it by function name, e.g.
+# pool.submit(Worker_Tasks.run, 'screen_chunk', ...).
+# Starting an interpreter and importing pandas takes a moment, so the workers are
+# started in the background right when the GUI starts.
+process_pool = None
+
+
+def start_pool():
+    """Starts the worker processes in the background, so the first task doesn't wait for them."""
+    pool = get_pool()
+    for _ in range(os.cpu_count() or 1):
+        pool.submit(int)  # Every task which finds no idle worker starts one
+
+
+def get_pool():
+    """Returns the shared pool of worker processes, creating it on first use."""
+    global process_pool
+    if process_pool is None:
+        process_pool = Worker_Tasks.create_pool(__file__)
+    return process_pool
+
+
+def split_into_chunks(items, n_chunks):
+    """Splits a list into about n_chunks lists of similar length."""
+    size = max(1, math.ceil(len(items) / max(n_chunks, 1)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+#%%
+# Screener
+
+# The screener checks every ticker in the data store against a few conditions:
+### Above SMA: the last close is above the average close of the last N days
+### N-day high: the last high is the highest high of the last N days (N = 252
+    # is the 52-week high)
+### Volume spike: the last volume is at least K times the average volume of the
+    # N days before
+### Expression: a derived-column style expression (e.g. Close > 1.05 * Open)
+    # which must be True for the last row
+# The tickers are split into chunks which run in the worker processes. Every worker
+# memory-maps only the columns a condition needs and reads just their last N values.
+# Double-clicking a result opens that ticker in the main window.
+
+SCREENER_COLUMNS = ['Ticker', 'Close', 'SMA', '% Below High', 'Volume Ratio']
+
+
+def screen_ticker(store, ticker, conditions):
+    """Checks one ticker; returns its result row, or None if it doesn't pass."""
+    folder = os.path.join(store, ticker)
+    columns = {}
+
+    def column(name):
+        if name not in columns:
+            columns[name] = np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r')
+        return columns[name]
+
+    close = column('Close')
+    if len(close) == 0:
+        return None
+    row = {'Ticker': ticker, 'Close': float(close[-1])}
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if 'sma' in conditions:
+            n = conditions['sma']
+            row['SMA'] = float(np.nanmean(close[-n:]))
+            if len(close) < n or not close[-1] > row['SMA']:
+                return None
+        if 'high' in conditions:
+            n = conditions['high']
+            high = column('High') if os.path.exists(os.path.join(folder, 'High.npy')) else close
+            peak = float(np.nanmax(high[-n:]))
+            row['% Below High'] = float((1 - close[-1] / peak) * 100)
+            if not high[-1] >= peak:
+                return None
+        if 'volume' in conditions:
+            k, n = conditions['volume']
+            volume = column('Volume')
+            row['Volume Ratio'] = float(volume[-1] / np.nanmean(volume[-n - 1:-1]))
+            if not row['Volume Ratio'] >= k:
+                return None
+        if 'expression' in conditions:
+            # The expression works value by value, so the last row alone decides
+            tree, names = parse_expression(conditions['expression'], store_columns(folder))
+            last_row = {identifier: np.asarray(column(name)[-1:]) for identifier, name in names.items()}
+            if not bool(np.asarray(pd.eval(ast.unparse(tree), local_dict=last_row)).ravel()[-1]):
+                return None
+    return row
+
+
+def screen_chunk(store, tickers, conditions):
+    """Runs the screener on a chunk of tickers (in a worker process)."""
+    rows, errors = [], []
+    for ticker in tickers:
+        try:
+            row = screen_ticker(store, ticker, conditions)
+            if row is not None:
+                rows.append(row)
+        except (OSError, ValueError, KeyError, SyntaxError, TypeError) as e:  # TypeError: e.g. ~ on floats
+            errors.append(f"{ticker}: {e}")
+    return rows, errors
+
+
+def import_into_store():
+    """Copies CSV/Excel files into the data store, one ticker per file."""
+    paths = filedialog.askopenfilenames(filetypes=[("Excel files", "*.xlsx *.xls"), ("CSV files", "*.csv")])
+    for path in paths:
+        ticker = os.path.splitext(os.path.basename(path))[0]
+        if path.endswith('.csv'):
+            df = pd.read_csv(path)
+        else:
+            df = pd.read_excel(path)
+        df['Date'] = pd.to_datetime(df['Date'],format='%Y-%m-%d')
+        store_ticker(ticker, df)
+    return len(paths)
+
+
+def open_ticker(ticker):
+    """Opens a data store ticker in the main data table and plot."""
+    global file_path, comparison_mode
+    file_path = os.path.join(DATA_STORE, ticker)
+    df = read_data(file_path)
+    comparison_mode = False
+    show_data(df)
+
+
+def open_screener_window():
+    """Opens the screener window."""
+    window = tk.Toplevel(root)
+    window.title("Screener")
+    window.geometry('800x500')
+
+    controls = tk.Frame(window)
+    controls.pack(pady=5)
+    use_sma, sma_days = tk.BooleanVar(value=True), tk.StringVar(value='200')
+    use_high, high_days = tk.BooleanVar(value=False), tk.StringVar(value='252')
+    use_volume, volume_factor, volume_days = tk.BooleanVar(value=False), tk.StringVar(value='2'), tk.StringVar(value='20')
+    use_expression, expression = tk.BooleanVar(value=False), tk.StringVar(value='Close > Open')
+
+    ttk.Checkbutton(controls, text="Close above SMA of days:", variable=use_sma).grid(row=0, column=0, sticky=tk.W)
+    ttk.Entry(controls, textvariable=sma_days, width=6).grid(row=0, column=1, sticky=tk.W)
+    ttk.Checkbutton(controls, text="At high of days:", variable=use_high).grid(row=1, column=0, sticky=tk.W)
+    ttk.Entry(controls, textvariable=high_days, width=6).grid(row=1, column=1, sticky=tk.W)
+    ttk.Checkbutton(controls, text="Volume at least x times / average of days:", variable=use_volume).grid(row=2, column=0, sticky=tk.W)
+    ttk.Entry(controls, textvariable=volume_factor, width=6).grid(row=2, column=1, sticky=tk.W)
+    ttk.Entry(controls, textvariable=volume_days, width=6).grid(row=2, column=2, sticky=tk.W)
+    ttk.Checkbutton(controls, text="Expression:", variable=use_expression).grid(row=3, column=0, sticky=tk.W)
+    ttk.Entry(controls, textvariable=expression, width=30).grid(row=3, column=1, columnspan=3, sticky=tk.W)
+    status = ttk.Label(controls, text=f"{len(store_tickers())} tickers in the data store")
+    status.grid(row=4, column=0, columnspan=2, sticky=tk.W)
+
+    result_table = ttk.Treeview(window, columns=SCREENER_COLUMNS, show="headings")
+    result_table.pack(expand=True, fill='both')
+    sort_state = {'column': None, 'reverse': False}
+
+    def sort_by(column):
+        """Sorts the result table by a column; clicking again reverses the order."""
+        reverse = sort_state['column'] == column and not sort_state['reverse']
+        sort_state.update(column=column, reverse=reverse)
+
+        def sort_key(item):
+            value = result_table.set(item, column)
+            try:
+                return (0, float(value), '')
+            except ValueError:
+                return (1, 0.0, value)  # Text and empty cells after the numbers
+        items = sorted(result_table.get_children(''), key=sort_key, reverse=reverse)
+        for position, item in enumerate(items):
+            result_table.move(item, '', position)
+
+    for column in SCREENER_COLUMNS:
+        result_table.heading(column, text=column, command=lambda c=column: sort_by(c))
+        result_table.column(column, anchor='center')
+    result_table.bind("<Double-1>", lambda event: [open_ticker(result_table.set(item, 'Ticker'))
+                                                   for item in result_table.selection()[:1]])
+
+    def run_scan():
+        """Starts the scan in the worker processes."""
+        conditions = {}
+        try:
+            if use_sma.get():
+                conditions['sma'] = int(sma_days.get())
+            if use_high.get():
+                conditions['high'] = int(high_days.get())
+            if use_volume.get():
+                conditions['volume'] = (float(volume_factor.get()), int(volume_days.get()))
+        except ValueError:
+            messagebox.showerror("Screener", "Please enter numbers for the days and the volume factor.")
+            return
+        if use_expression.get():
+            conditions['expression'] = expression.get()
+
+        tickers = store_tickers()
+        for item in result_table.get_children():
+            result_table.delete(item)
+        pool = get_pool()
+        chunks = split_into_chunks(tickers, (os.cpu_count() or 1) * 4)
+        futures = [pool.submit(Worker_Tasks.run, 'screen_chunk', DATA_STORE, chunk, conditions) for chunk in chunks]
+        scan_button.config(state=tk.DISABLED)
+        root.after(50, collect_results, futures, len(tickers), [], [])
+
+    def collect_results(futures, total, found, errors):
+        """Adds finished chunks to the table until all of them are done."""
+        pending = []
+        for future in futures:
+            if not future.done():
+                pending.append(future)
+                continue
+            try:
+                rows, chunk_errors = future.result()
+            except Exception as e:  # E.g. a worker process died; the other chunks still count
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            errors.extend(chunk_errors)
+            for row in rows:
+                found.append(row)
+                result_table.insert("", "end", values=[row['Ticker']] + [
+                    f"{row[column]:.2f}" if column in row else "" for column in SCREENER_COLUMNS[1:]])
+        status.config(text=f"{len(found)} of {total} tickers passed" + (f", {len(errors)} errors" if errors else "")
+                      + (" (scanning...)" if pending else ""))
+        if pending:
+            root.after(50, collect_results, pending, total, found, errors)
+        else:
+            scan_button.config(state=tk.NORMAL)
+            if errors:
+                print("Screener errors:\n" + "\n".join(errors))
+
+    def import_files():
+        """Adds files to the data store and updates the ticker count."""
+        if import_into_store():
+            status.config(text=f"{len(store_tickers())} tickers in the data store")
+
+    scan_button = tk.Button(controls, text="Run Screener", command=run_scan)
+    scan_button.grid(row=4, column=2, padx=5)
+    tk.Button(controls, text="Add Files to Store", command=import_files).grid(row=4, column=3, padx=5)
+
+#%%
+# Export Function
+
+# The export runs in a worker thread, so the window stays usable while a large file
+# is written. The worker only reports its progress through a queue; the progress
+# bar itself is updated from the Tk thread by poll_export.
+export_events = queue.Queue()
+
+
+def export_source_frame():
+    """Returns the data to export: the raw data, the filtered rows or the current view."""
+    # The export thread gets its own (shallow) copy: columns which are added or
+    # changed in current_df while it is writing don't end up in the file halfway
+    if export_source.get() == 'Raw Data':
+        return current_df.copy(deep=False)
+    if export_source.get() == 'Filtered Data':
+        row_filter = selected_filter()
+        return current_df[current_df[row_filter].to_numpy(dtype=bool)] if row_filter else current_df.copy(deep=False)
+    columns = [column_listbox.get(i) for i in column_listbox.curselection()]
+    if not columns:
+        columns = ['High']  # Default if nothing selected
+    view = get_view(current_df, selected_granularity.get(), columns, chart_type.get(), show_volume.get(),
+                    selected_filter())
+    return pd.DataFrame({'Date': view['dates'], **view['values']})
+
+
+def export_data():
+    """Asks for a target file and starts writing the selected data to it."""
+    if current_df is None:
+        return
+    df = export_source_frame()
+    path = filedialog.asksaveasfilename(defaultextension='.xlsx',
+                                        filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
+    if path:
+        export_button.config(state=tk.DISABLED)
+        export_progress['value'] = 0
+        threading.Thread(target=run_export, args=(df, path)).start()
+        root.after(100, poll_export)
+
+
+def run_export(df, path):
+    """Writes the file in the worker thread and reports back through export_events."""
+    try:
+        write_frame(df, path, lambda done, total: export_events.put(('progress', done, total)))
+        export_events.put(('done', path, None))
+    except Exception as e:
+        export_events.put(('error', e, None))
+
+
+def poll_export():
+    """Moves the progress bar and re-enables the button when the export is over."""
+    finished = False
+    try:
+        while True:
+            kind, value, total = export_events.get_nowait()
+            if kind == 'progress':
+                export_progress['maximum'] = max(total, 1)
+                export_progress['value'] = value
+            else:
+                finished = True
+                if kind == 'error':
+                    messagebox.showerror("Export failed", str(value))
+    except queue.Empty:
+        pass
+    if finished:
+        export_button.config(state=tk.NORMAL)
+    else:
+        root.after(100, poll_export)
+
+
+#%%
+
+# Create a Frame for the buttons
+button_frame = tk.Frame(root)
+button_frame.pack(pady=10)
+
+# File Loading Button
+file_load_button = tk.Button(button_frame, text="Load Data", command=load_data)
+file_load_button.pack(side=tk.LEFT, padx=5)
+
+# Statistics Loading Button
+stat_load_button = tk.Button(button_frame, text="Load Statistics", command=load_statistics)
+stat_load_button.pack(side=tk.LEFT, padx=5)
+
+# Comparison Button and Rebase Option
+compare_button = tk.Button(button_frame, text="Compare Tickers", command=load_comparison)
+compare_button.pack(side=tk.LEFT, padx=5)
+ttk.Checkbutton(button_frame, text="Rebase to 100", variable=rebase_prices, command=lambda: select_granularity()).pack(side=tk.LEFT, padx=5)
+correlation_button = tk.Button(button_frame, text="Correlations", command=open_correlation_window)
+correlation_button.pack(side=tk.LEFT, padx=5)
+screener_button = tk.Button(button_frame, text="Screener", command=open_screener_window)
+screener_button.pack(side=tk.LEFT, padx=5)
+
+# List Option Buttons (for granularity)
+selected_granularity = tk.StringVar(value='D')  # Default to daily
+ttk.Label(button_frame, text="Select Granularity:").pack(side=tk.LEFT, padx=5)  # Label for the options
+ttk.Radiobutton(button_frame, text="Daily", variable=selected_granularity, value='D', command=lambda: select_granularity()).pack(anchor=tk.W,side=tk.LEFT, padx=5)
+ttk.Radiobutton(button_frame, text="Weekly", variable=selected_granularity, value='W', command=lambda: select_granularity()).pack(anchor=tk.W,side=tk.LEFT, padx=5)
+ttk.Radiobutton(button_frame, text="Monthly", variable=selected_granularity, value='M', command=lambda: select_granularity()).pack(anchor=tk.W,side=tk.LEFT, padx=5)
+
+# List Option Buttons (for the chart type) and Volume Checkbutton
+chart_type = tk.StringVar(value='Line')
+ttk.Label(button_frame, text="Chart:").pack(side=tk.LEFT, padx=5)
+ttk.Radiobutton(button_frame, text="Line", variable=chart_type, value='Line', command=lambda: select_granularity()).pack(anchor=tk.W,side=tk.LEFT, padx=5)
+ttk.Radiobutton(button_frame, text="Candles", variable=chart_type, value='Candles', command=lambda: select_granularity()).pack(anchor=tk.W,side=tk.LEFT, padx=5)
+ttk.Radiobutton(button_frame, text="OHLC Bars", variable=chart_type, value='OHLC', command=lambda: select_granularity()).pack(anchor=tk.W,side=tk.LEFT, padx=5)
+show_volume = tk.BooleanVar(value=True)
+ttk.Checkbutton(button_frame, text="Volume", variable=show_volume, command=lambda: select_granularity()).pack(side=tk.LEFT, padx=5)
+
+# Listbox for Selecting Columns
+ttk.Label(button_frame, text="Select Columns to Plot:").pack(side=tk.LEFT, padx=5)
+column_listbox = tk.Listbox(button_frame, selectmode=tk.MULTIPLE)
+column_listbox.pack(side=tk.LEFT, padx=5, pady=5)
+column_listbox.bind("<<ListboxSelect>>", lambda event: select_granularity())
+
+# Add items to the Listbox
+for column in ['Open', 'High', 'Low', 'Close']:
+    column_listbox.insert(tk.END, column)
+
+# Checkbutton to switch background rendering on or off
+ttk.Checkbutton(button_frame, text="Render in Background", variable=background_render).pack(side=tk.LEFT, padx=5)
+
+# Second row of controls, below the first one
+tool_frame = tk.Frame(root)
+tool_frame.pack(pady=5)
+
+# Export Button, Source Choice and Progress Bar
+export_source = tk.StringVar(value='Raw Data')
+ttk.Label(tool_frame, text="Export:").pack(side=tk.LEFT, padx=5)
+ttk.Combobox(tool_frame, textvariable=export_source, values=['Raw Data', 'Filtered Data', 'Current View'], state='readonly', width=12).pack(side=tk.LEFT, padx=5)
+export_button = tk.Button(tool_frame, text="Export Data", command=export_data)
+export_button.pack(side=tk.LEFT, padx=5)
+export_progress = ttk.Progressbar(tool_frame, length=150, mode='determinate')
+export_progress.pack(side=tk.LEFT, padx=5)
+
+# Entry and Button for Derived Columns, and the Filter Choice
+ttk.Label(tool_frame, text="Derived Column (Name = expression):").pack(side=tk.LEFT, padx=5)
+derived_entry = ttk.Entry(tool_frame, width=35)
+derived_entry.pack(side=tk.LEFT, padx=5)
+derived_entry.bind("<Return>", lambda event: add_derived_column())
+tk.Button(tool_frame, text="Add Column", command=add_derived_column).pack(side=tk.LEFT, padx=5)
+filter_column = tk.StringVar(value=NO_FILTER)
+ttk.Label(tool_frame, text="Filter:").pack(side=tk.LEFT, padx=5)
+filter_box = ttk.Combobox(tool_frame, textvariable=filter_column, values=[NO_FILTER], state='readonly', width=12)
+filter_box.pack(side=tk.LEFT, padx=5)
+filter_box.bind("<<ComboboxSelected>>", lambda event: select_granularity())
+
+#%%
+# Start the worker processes, which need a moment to load this script
+start_pool()
+
+# Start the render worker and the loop which picks up its results
+threading.Thread(target=render_worker, daemon=True).start()
+root.after(15, poll_render_results)
+
+#%%
+root.mainloop()
\ No newline at end of file
@@ -0,0 +1,315 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import datetime as dt
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+
+#%%
+# Performance Regression Benchmark
+
+# Runs fixed scenarios against the newest numbered GUI script and compares their
+# latencies and memory with a stored baseline, so a change which makes the GUI
+# slower is noticed before it is committed:
+### open:        opening a CSV file of N_ROWS synthetic minute bars (table and plot)
+### granularity: switching the granularity 20 times
+### columns:     selecting and deselecting 4 columns one by one
+### statistics:  computing the statistics (describe and risk metrics)
+### hover:       moving the mouse across the plot from left to right
+# Every scenario runs in its own Python process, which executes the GUI script
+# without its mainloop() and then calls the same functions the buttons call:
+### Rendering runs on the Tk thread (Render in Background off), so every timed
+    # step includes drawing the plot, and the pending Tk events are processed
+    # before the clock stops.
+### The peak RSS is the highest resident memory while the scenario runs. The
+    # loading before a scenario doesn't count: the peak is reset through
+    # /proc/self/clear_refs first (Linux only).
+### Without a display, Xvfb is started for the scenarios, so the benchmark runs
+    # on a headless Linux box (xvfb has to be installed).
+# The median and 95th percentile of every scenario and its peak RSS go into
+# RESULTS_FILE, which keeps one baseline per GUI script: a new numbered script is
+# never compared with the numbers of an older one. The first run of a script
+# becomes its baseline; every later run is added to the history and compared with
+# it. If a scenario is slower (or uses more memory) than the baseline by more than
+# the threshold, the exit code is 1.
+# Run it with: python Benchmark_Regression.py [--threshold 0.2] [--update-baseline]
+
+RESULTS_FILE = 'perf_results.json'
+RESULTS_VERSION = 2  # Format of RESULTS_FILE
+N_ROWS = 1_000_000
+SCENARIOS = ['open', 'granularity', 'columns', 'statistics', 'hover']
+OPEN_REPEATS = 3  # Opening the file fills the table, so it is repeated less often
+GRANULARITY_SWITCHES = 20
+SWITCH_RULES = ['W', 'M', '1h', '15min', 'D']  # Cycled through
+COLUMNS = ['Open', 'High', 'Low', 'Close']
+STATISTICS_REPEATS = 10
+HOVER_STEPS = 200
+THRESHOLD = 0.2  # Allowed slowdown, 0.2 = 20%
+XVFB_DISPLAY = ':97'
+
+
+def latest_gui_script():
+    """Returns the numbered GUI script with the highest number."""
+    scripts = glob.glob('[0-9]*.GUI_*.py')
+    return max(scripts, key=lambda script: int(re.match(r'\d+', script).group()))
+
+#%%
+# Synthetic Data
+
+def write_minute_bars(path, n_rows, seed=0):
+    """Writes n_rows minute bars of a random walk within the session hours to a CSV file."""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2000-01-03', periods=n_rows // 390 + 1)
+    minutes = pd.timedelta_range('9:30:00', periods=390, freq='min')
+    dates = (days.to_numpy()[:, None] + minutes.to_numpy()[None, :]).ravel()[:n_rows]
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, n_rows)))
+    spread = np.abs(rng.normal(0, 0.0003, n_rows)) * close
+    pd.DataFrame({
+        'Date': pd.DatetimeIndex(dates).strftime('%Y-%m-%d %H:%M:%S'),
+        'Open': np.concatenate([[100], close[:-1]]),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(0, 10_000, n_rows),
+    }).to_csv(path, index=False, float_format='%.4f')
+
+#%%
+# Scenarios (run in the child process)
+
+def reset_peak_rss():
+    """Resets the peak resident memory of this process, if the kernel allows it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass  # The peak then includes the loading before the scenario
+
+
+def peak_rss_mb():
+    """Returns the peak resident memory of this process in MB (VmHWM)."""
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(gui, action):
+    """Runs action and the Tk events it causes; returns the seconds it took."""
+    start = time.perf_counter()
+    action()
+    gui['root'].update()
+    return time.perf_counter() - start
+
+
+def start_gui(script):
+    """Executes the GUI script without its mainloop; returns its globals."""
+    with open(script) as file:
+        source = file.read()
+    source = source[:source.rindex('root.mainloop()')]
+    # __file__ tells the worker pool which script to load (see Worker_Tasks.py)
+    gui = {'__name__': '__main__', '__file__': os.path.abspath(script)}
+    exec(compile(source, script, 'exec'), gui)
+    gui['background_render'].set(False)
+    gui['root'].geometry('1600x1000')
+    gui['root'].update()
+    return gui
+
+
+def run_open(gui, csv_path):
+    return [timed(gui, lambda: gui['open_files'](csv_path)) for _ in range(OPEN_REPEATS)]
+
+
+def run_granularity(gui, csv_path):
+    times = []
+    for i in range(GRANULARITY_SWITCHES):
+        gui['selected_granularity'].set(SWITCH_RULES[i % len(SWITCH_RULES)])
+        times.append(timed(gui, gui['select_granularity']))
+    return times
+
+
+def run_columns(gui, csv_path):
+    listbox = gui['column_listbox']
+    times = []
+    for select in [listbox.selection_set, listbox.selection_clear]:
+        for column in COLUMNS:
+            select(listbox.get(0, 'end').index(column))
+            times.append(timed(gui, gui['select_granularity']))
+    return times
+
+
+def run_statistics(gui, csv_path):
+    return [timed(gui, gui['load_statistics']) for _ in range(STATISTICS_REPEATS)]
+
+
+def run_hover(gui, csv_path):
+    from matplotlib.backend_bases import MouseEvent
+    canvas = gui['canvas']
+    box = gui['fig'].axes[0].bbox
+    y = (box.y0 + box.y1) / 2
+    times = []
+    for x in np.linspace(box.x0 + 1, box.x1 - 1, HOVER_STEPS):
+        event = MouseEvent('motion_notify_event', canvas, x, y)
+        times.append(timed(gui, lambda: canvas.callbacks.process('motion_notify_event', event)))
+    return times
+
+
+def run_scenario(script, scenario, csv_path):
+    """Runs one scenario and prints its timings and peak RSS as JSON."""
+    run = globals()['run_' + scenario]  # Before the GUI script adds its globals
+    gui = start_gui(script)
+    if scenario != 'open':  # Every other scenario starts with the file open
+        gui['open_files'](csv_path)
+        gui['root'].update()
+    reset_peak_rss()
+    times = run(gui, csv_path)
+    print(json.dumps({'times': times, 'peak_rss_mb': peak_rss_mb()}))
+    sys.stdout.flush()
+    os._exit(0)  # Skips the Tk and worker pool teardown
+
+#%%
+# Results
+
+def summarize(times, peak_rss):
+    """Median and 95th percentile in ms, and the peak RSS in MB."""
+    times_ms = np.array(times) * 1000
+    return {'median_ms': round(float(np.median(times_ms)), 3),
+            'p95_ms': round(float(np.percentile(times_ms, 95)), 3),
+            'peak_rss_mb': round(peak_rss, 1),
+            'samples': len(times)}
+
+
+def read_results(path, script, new_baseline=False):
+    """Reads the results file; with new_baseline, the baseline of script is dropped."""
+    empty = {'version': RESULTS_VERSION, 'baselines': {}, 'history': []}
+    if not os.path.exists(path):
+        return empty
+    with open(path) as file:
+        results = json.load(file)
+    if results.get('version') != RESULTS_VERSION:
+        if new_baseline:
+            return empty
+        raise SystemExit(f"{path} has version {results.get('version')}, expected {RESULTS_VERSION}; "
+                         "run with --update-baseline to start a new one")
+    if new_baseline:
+        results['baselines'].pop(script, None)
+    return results
+
+
+def git_commit():
+    """Returns the current git commit, or None outside of a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(run, baseline, threshold):
+    """Returns a line for every measure of run which exceeds the baseline by more than threshold."""
+    lines = []
+    for scenario, measures in run['scenarios'].items():
+        base = baseline['scenarios'].get(scenario)
+        if base is None:
+            continue  # New scenario: nothing to compare with
+        for measure in ['median_ms', 'p95_ms', 'peak_rss_mb']:
+            if measures[measure] > base[measure] * (1 + threshold):
+                lines.append(f"{scenario} {measure}: {measures[measure]:.1f} vs baseline {base[measure]:.1f} "
+                             f"(+{measures[measure] / base[measure] - 1:.0%})")
+    return lines
+
+#%%
+# Headless Display
+
+def start_display():
+    """Starts Xvfb if there is no display; returns its process (or None)."""
+    if os.environ.get('DISPLAY'):
+        return None
+    if shutil.which('Xvfb') is None:
+        raise SystemExit("No display and no Xvfb: install xvfb or set DISPLAY")
+    xvfb = subprocess.Popen(['Xvfb', XVFB_DISPLAY, '-screen', '0', '1920x1200x24', '-nolisten', 'tcp'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = XVFB_DISPLAY
+    time.sleep(1)  # Give the server time to accept connections
+    if xvfb.poll() is not None:
+        raise SystemExit(f"Xvfb could not start on {XVFB_DISPLAY}")
+    return xvfb
+
+#%%
+# Benchmark
+
+def main():
+    parser = argparse.ArgumentParser(description="GUI performance regression benchmark")
+    parser.add_argument('--script', default=latest_gui_script())
+    parser.add_argument('--rows', type=int, default=N_ROWS)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="allowed slowdown over the baseline (0.2 = 20%%)")
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--update-baseline', action='store_true', help="make this run the new baseline of the script")
+    parser.add_argument('--scenario', choices=SCENARIOS, help=argparse.SUPPRESS)  # Child process
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(os.path.abspath(args.script), args.scenario, args.csv)
+
+    script = os.path.basename(args.script)
+    results = read_results(args.results, script, args.update_baseline)
+    xvfb = start_display()
+    run = {'date': dt.datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+           'script': script, 'rows': args.rows, 'scenarios': {}}
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            # The GUI script loads stock_data.xlsx on start and keeps its session
+            # and spill files in the working directory, so it runs in a fresh one
+            shutil.copy('stock_data.xlsx', folder)
+            csv_path = os.path.join(folder, 'minute_bars.csv')
+            write_minute_bars(csv_path, args.rows)
+            print(f"{args.script}, {args.rows:,} rows\n")
+            print(f"{'scenario':>12} {'median (ms)':>12} {'p95 (ms)':>10} {'peak RSS (MB)':>14}")
+            for scenario in SCENARIOS:
+                child = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--script', os.path.abspath(args.script),
+                     '--scenario', scenario, '--csv', csv_path],
+                    cwd=folder, capture_output=True, text=True)
+                if child.returncode != 0:
+                    raise SystemExit(f"Scenario {scenario} failed:\n{child.stderr}")
+                output = json.loads(child.stdout.strip().splitlines()[-1])
+                measures = summarize(output['times'], output['peak_rss_mb'])
+                run['scenarios'][scenario] = measures
+                print(f"{scenario:>12} {measures['median_ms']:>12.1f} {measures['p95_ms']:>10.1f} "
+                      f"{measures['peak_rss_mb']:>14.1f}")
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+
+    failures = []
+    baseline = results['baselines'].get(script)
+    if baseline is None:
+        results['baselines'][script] = baseline = run
+        print(f"\nNo baseline for {script} yet: this run is its baseline in {args.results}")
+    elif baseline['rows'] != args.rows:
+        print(f"\nThe baseline of {script} has {baseline['rows']:,} rows: not compared")
+    else:
+        failures = regressions(run, baseline, args.threshold)
+    results['history'].append(run)
+    with open(args.results, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    if failures:
+        print(f"\nSlower than the baseline of {script} ({baseline['commit']}) by more than {args.threshold:.0%}:")
+        print("\n".join(failures))
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
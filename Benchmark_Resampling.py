@@ -0,0 +1,98 @@
+import time
+import numpy as np
+import pandas as pd
+
+#%%
+# Resampling Benchmark
+
+# Compares the integer bucket resampling of 22.GUI_Intraday_Resampling.py with the
+# pandas resample() path it replaces, on synthetic minute bars (OHLCV).
+### The "Intraday Resampling" cell of the GUI script is executed on its own, so the
+    # benchmark measures exactly the code the GUI runs, without opening a window.
+### Every rule is timed a few times and the best run is reported.
+### Before timing, the results of both paths are compared. pandas also returns
+    # the empty buckets (nights and weekends) as rows of NaN, which are dropped
+    # before comparing.
+# Run it with: python Benchmark_Resampling.py
+
+GUI_SCRIPT = '22.GUI_Intraday_Resampling.py'
+N_ROWS = 14_000_000  # Minute bars (10M after dropping the weekends)
+RULES = ['5min', '15min', '1h', '4h', 'D', 'W', 'M']
+REPEATS = 3
+AGGREGATION = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+# Execute the resampling cell of the GUI script
+with open(GUI_SCRIPT) as file:
+    source = file.read()
+cell = source[source.index('#%%\n# Intraday Resampling'):source.index('#%%\n# View Cache')]
+exec(cell)
+
+#%%
+# Synthetic Data
+
+def minute_bars(n_rows, seed=0):
+    """Returns n_rows minute bars of a random walk, with gaps on weekends."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2000-01-03', periods=n_rows, freq='min')
+    dates = dates[dates.dayofweek < 5]  # No trading on weekends
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, len(dates))))
+    spread = np.abs(rng.normal(0, 0.0003, len(dates))) * close
+    return pd.DataFrame({
+        'Date': dates,
+        'Open': np.roll(close, 1),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(0, 10_000, len(dates)).astype(float),
+    })
+
+
+def pandas_rule(rule):
+    """Returns the pandas name of a rule ('M' became 'ME' in pandas 2.2)."""
+    if rule == 'M':
+        try:
+            pd.tseries.frequencies.to_offset('ME')
+            return 'ME'
+        except ValueError:
+            return 'M'
+    return rule
+
+
+def pandas_resample(df, rule):
+    """The pandas path: resample().agg() and dropping the empty buckets."""
+    resampled = df.set_index('Date').resample(pandas_rule(rule)).agg(AGGREGATION)
+    return resampled.dropna(subset=['Open']).reset_index()
+
+
+def best_time(function, *args):
+    """Returns the fastest of REPEATS runs in seconds."""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+#%%
+# Benchmark
+
+if __name__ == '__main__':
+    df = minute_bars(N_ROWS)
+    print(f"{len(df):,} minute bars\n")
+    print(f"{'rule':>6} {'buckets':>10} {'pandas (s)':>11} {'buckets (s)':>12} {'speedup':>8}")
+    for rule in RULES:
+        expected = pandas_resample(df, rule)
+        result = resample_frame(df, rule, AGGREGATION)
+        assert len(result) == len(expected), rule
+        assert (result['Date'].to_numpy() == expected['Date'].to_numpy(dtype='datetime64[ns]')).all(), rule
+        for column in AGGREGATION:
+            assert np.allclose(result[column], expected[column]), (rule, column)
+
+        pandas_seconds = best_time(pandas_resample, df, rule)
+        bucket_seconds = best_time(resample_frame, df, rule, AGGREGATION)
+        print(f"{rule:>6} {len(result):>10,} {pandas_seconds:>11.3f} {bucket_seconds:>12.3f} "
+              f"{pandas_seconds / bucket_seconds:>7.1f}x")
+
+    # Session hours: only the bucket path has them, so it is timed on its own
+    session_seconds = best_time(resample_frame, df, '1h', AGGREGATION, True)
+    print(f"\n1h bars within the session hours: {session_seconds:.3f} s")
@@ -0,0 +1,199 @@
+import os
+import time
+import queue
+import asyncio
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+#%%
+# Async Bridge Tests
+
+# Tests the asyncio bridge of 23.GUI_Async_Bridge.py with local stand-ins instead
+# of the network, the files and the Tk window:
+### The "Async Bridge" cell of the GUI script is executed on its own (like in
+    # Benchmark_Resampling.py), with stand-ins for the few names it uses from the
+    # rest of the script: root, the download widgets, yfinance and the data loading
+    # functions (use_data records what the watcher read).
+### The asyncio loop runs in its companion thread as in the GUI. The Tk side is
+    # played by this thread, which runs poll_tk_calls() until the expected calls
+    # have arrived.
+### The stand-in sources are coroutines and functions which sleep instead of
+    # waiting for the network or the disk, and fail on purpose where an error is
+    # tested.
+# Run it with: python Test_Async_Bridge.py
+
+GUI_SCRIPT = '23.GUI_Async_Bridge.py'
+TIMEOUT = 5.0  # Seconds to wait for the expected calls on the "Tk thread"
+DELAY = 0.2  # Seconds every stand-in download takes
+
+
+class FakeRoot:
+    """Stand-in for the Tk root; poll_tk_calls isn't scheduled again, the tests call it."""
+
+    def after(self, ms, function):
+        pass
+
+
+class FakeWidget:
+    """Stand-in for a Tk widget: records its config() calls."""
+
+    def __init__(self):
+        self.configs = []
+
+    def config(self, options=None, **kwargs):
+        self.configs.append({**(options or {}), **kwargs})
+
+
+class FakeVar:
+    """Stand-in for a Tk variable."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class FakeTicker:
+    """Stand-in for yf.Ticker: a few days of prices after DELAY seconds, nothing for 'BAD'."""
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def history(self, start=None, end=None):
+        time.sleep(DELAY)
+        if self.ticker == 'BAD':
+            return pd.DataFrame()
+        dates = pd.date_range('2024-01-02', periods=3, name='Date', tz='America/New_York')
+        return pd.DataFrame({'Close': np.arange(3.0), 'Dividends': 0.0}, index=dates)
+
+
+class FakeYfinance:
+    Ticker = FakeTicker
+
+
+# Execute the async bridge cell of the GUI script with the stand-ins
+with open(GUI_SCRIPT) as file:
+    source = file.read()
+cell = source[source.index('#%%\n# Async Bridge'):source.index('#%%\n# Export Function')]
+reloaded = []  # (df, mtime, errors) the watcher handed to use_data on the Tk thread
+bridge = {'asyncio': asyncio, 'queue': queue, 'pd': pd, 'yf': FakeYfinance, 'root': FakeRoot(),
+          'download_status': FakeWidget(), 'file_path': None, 'file_mtime': None,
+          'source_mtime': lambda path: os.path.getmtime(path) if os.path.exists(path) else None,
+          'parse_source': lambda path, *options: (pd.read_csv(path), []), 'files_are_tickers': False,
+          'use_data': lambda *args: reloaded.append(args), 'show_data': lambda df: None,
+          'comparison_mode': False,
+          'show_async_error': lambda error: None}
+exec(cell, bridge)
+bridge['WATCH_INTERVAL'] = 0.05
+threading.Thread(target=bridge['run_async_loop'], daemon=True).start()
+
+
+def run_tk_until(condition):
+    """Runs the calls handed to the Tk thread until condition() is true (or TIMEOUT)."""
+    deadline = time.perf_counter() + TIMEOUT
+    while not condition():
+        assert time.perf_counter() < deadline, "Timed out waiting for calls on the Tk thread"
+        bridge['poll_tk_calls']()
+        time.sleep(0.01)
+
+#%%
+# Tests
+
+def test_run_async_result_on_tk_thread():
+    """on_done gets the result of the coroutine, and runs on the Tk thread."""
+    results = []
+
+    async def answer():
+        await asyncio.sleep(0.01)
+        return 42
+
+    bridge['run_async'](answer(), lambda result: results.append((result, threading.get_ident())))
+    run_tk_until(lambda: results)
+    assert results == [(42, threading.get_ident())]
+
+
+def test_call_in_tk_from_other_threads():
+    """Calls from the asyncio thread and from worker threads all run on the Tk thread, in order."""
+    calls = []
+
+    async def report():
+        bridge['call_in_tk'](calls.append, ('loop', threading.get_ident()))
+        await asyncio.to_thread(bridge['call_in_tk'], calls.append, ('worker', threading.get_ident()))
+
+    bridge['run_async'](report())
+    run_tk_until(lambda: len(calls) == 2)
+    assert [name for name, _ in calls] == ['loop', 'worker']
+    assert all(thread != threading.get_ident() for _, thread in calls)  # Queued from other threads
+
+
+def test_errors_reach_on_error():
+    """An exception of the coroutine goes to on_error (on the Tk thread), not to on_done."""
+    done, errors = [], []
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("stand-in failure")
+
+    bridge['run_async'](fail(), done.append, errors.append)
+    run_tk_until(lambda: errors)
+    assert not done
+    assert isinstance(errors[0], ValueError) and str(errors[0]) == "stand-in failure"
+
+
+def test_downloads_run_concurrently():
+    """Tickers download at the same time; failed tickers are reported, not raised."""
+    results = []
+    tickers = ['AAA', 'BBB', 'CCC', 'DDD', 'BAD']
+    start = time.perf_counter()
+    bridge['run_async'](bridge['download_tickers'](tickers, None, None), results.append)
+    run_tk_until(lambda: results)
+    seconds = time.perf_counter() - start
+    data, errors = results[0]
+    assert sorted(data) == ['AAA', 'BBB', 'CCC', 'DDD'] and list(errors) == ['BAD']
+    assert list(data['AAA'].columns) == ['Date', 'Close']
+    assert data['AAA']['Date'].dt.tz is None  # Daily bars keep the exchange's dates
+    assert seconds < 2 * DELAY, f"{len(tickers)} downloads of {DELAY} s took {seconds:.2f} s"
+    assert bridge['download_status'].configs[-1] == {'text': f"Downloaded {len(tickers)} of {len(tickers)}"}
+
+
+def test_watcher_reloads_and_stops_when_cancelled():
+    """The watcher reads a changed file; after cancel() it doesn't read anything anymore."""
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'data.csv')
+        pd.DataFrame({'Date': ['2024-01-02'], 'Close': [1.0]}).to_csv(path, index=False)
+        bridge['file_path'] = path
+        bridge['file_mtime'] = os.path.getmtime(path)
+        bridge['watch_file'] = FakeVar(True)
+        reloaded.clear()
+
+        bridge['toggle_watch']()
+        future = bridge['watch_future']
+        pd.DataFrame({'Date': ['2024-01-02', '2024-01-03'], 'Close': [1.0, 2.0]}).to_csv(path, index=False)
+        os.utime(path, (time.time() + 10, time.time() + 10))  # A new mtime, even on coarse clocks
+        run_tk_until(lambda: reloaded)
+        assert len(reloaded[0][0]) == 2 and reloaded[0][1] == os.path.getmtime(path)
+
+        bridge['watch_file'] = FakeVar(False)
+        bridge['toggle_watch']()
+        run_tk_until(future.done)
+        assert future.cancelled() and bridge['watch_future'] is None
+
+        reloaded.clear()
+        os.utime(path, (time.time() + 20, time.time() + 20))
+        time.sleep(5 * bridge['WATCH_INTERVAL'])
+        bridge['poll_tk_calls']()
+        assert not reloaded
+        bridge['file_path'] = None
+
+#%%
+# Run the tests
+
+if __name__ == '__main__':
+    tests = [value for name, value in list(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"ok   {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
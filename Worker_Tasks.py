@@ -0,0 +1,60 @@
+import os
+import sys
+import ast
+import importlib.machinery
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+#%%
+# Worker Tasks
+
+# The GUI scripts (from 17.GUI_Screener.py on) run CPU heavy work in a pool of
+# worker processes. The workers are new interpreters (forkserver, or spawn where
+# the platform doesn't have it, e.g. Windows), not forks of the GUI process, so
+# they work the same on every platform and never inherit the Tk and render
+# threads or their locks. A new interpreter still needs the task functions:
+### A GUI script can't simply be imported: its name starts with a digit, and
+    # importing it would build and run the whole GUI. Instead every worker runs
+    # only the imports, the function and class definitions and the UPPER_CASE
+    # constants of the script which created the pool (load_script). Everything
+    # else, like creating the Tk window, is skipped.
+### Tasks are sent by function name: pool.submit(run, 'screen_chunk', ...) calls
+    # screen_chunk of the script in a worker. Arguments and results are pickled as
+    # for any other process pool.
+### multiprocessing normally runs the main script once more in every new
+    # interpreter, which is why scripts guard their code with
+    # "if __name__ == '__main__':". The GUI scripts are written without it, so
+    # create_pool() gives the main module a module spec named __main__, which
+    # tells multiprocessing that there is nothing to run.
+
+DEFINITIONS = (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+script_globals = {'__name__': 'gui_script'}  # Definitions of the GUI script, in a worker process
+
+
+def is_constant(node):
+    """True for an assignment to UPPER_CASE names, like BACKTEST_COST = 0.0005."""
+    return isinstance(node, ast.Assign) and all(isinstance(target, ast.Name) and target.id.isupper()
+                                                for target in node.targets)
+
+
+def load_script(path):
+    """Runs the imports, definitions and constants of a GUI script (in a new worker)."""
+    with open(path) as file:
+        tree = ast.parse(file.read(), path)
+    tree.body = [node for node in tree.body if isinstance(node, DEFINITIONS) or is_constant(node)]
+    exec(compile(tree, path, 'exec'), script_globals)
+
+
+def run(name, *args):
+    """Calls a function of the GUI script (in a worker)."""
+    return script_globals[name](*args)
+
+
+def create_pool(script):
+    """Returns a process pool whose workers know the functions of the given GUI script."""
+    main = sys.modules['__main__']
+    if getattr(main, '__spec__', None) is None:
+        main.__spec__ = importlib.machinery.ModuleSpec('__main__', None)
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context(method),
+                               initializer=load_script, initargs=(os.path.abspath(script),))